@@ -0,0 +1,713 @@
+# api_core.py
+"""Request handling shared by the Flask app (app.py) and the ASGI app (asgi_app.py).
+
+Nothing here touches the web framework or MongoDB: routes parse the request,
+do their own database I/O (blocking pymongo or async motor) and use these
+functions to compute recommendations and build the JSON payloads, so both
+serving modes keep the same route contracts.
+
+The per-worker background services are set up here too, so both apps run them
+the same way: the warm-up (``WarmUpTask``), the write-behind queue for
+recommendation documents (``build_write_queue``) and the health/readiness
+payloads that report on them and on the app's MongoSupervisor.
+"""
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import metrics
+import model_registry
+from cache import LRUCache, TTLCache
+from meal_index import find_meal
+from meal_selection import select_meals, plan_week
+from password_pool import PasswordPool
+from rate_limit import limiter_from_env
+from write_behind import WriteBehindQueue
+
+# Macro targets are pure functions of the profile, so they are cached per worker
+TARGETS_CACHE_SIZE = int(os.getenv('TARGETS_CACHE_SIZE', '4096'))
+targets_cache = LRUCache(TARGETS_CACHE_SIZE)
+
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '1000'))
+MAX_PLAN_DAYS = 14
+MAX_ALTERNATIVES = 50
+
+# Password hashing runs on a small bounded pool; sign-in/sign-up attempts are limited
+# per client IP and sign-in attempts per email (in memory, per worker)
+password_pool = PasswordPool()
+ip_limiter = limiter_from_env('AUTH_IP', 30, 60)
+email_limiter = limiter_from_env('AUTH_EMAIL', 10, 300)
+
+# Reverse proxies in front of the app whose X-Forwarded-For/-Proto are trusted (0 = none,
+# the client is the connecting address); with none, every user behind a proxy shares one IP limit
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '0'))
+
+
+# Signed-in users' profiles ({'name', 'email'}) by session user id, so /api/auth/me
+# doesn't hit MongoDB on every page navigation
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '60'))
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+# ✅ Cache a user's public profile (call again, or invalidate, whenever name/email change)
+def cache_user_profile(user_id, user):
+    profile = {'name': user.get('name', ''), 'email': user.get('email', '')}
+    user_cache.set(user_id, profile)
+    return profile
+
+
+def invalidate_user_profile(user_id):
+    user_cache.delete(user_id)
+
+
+# ✅ Seconds the client has to wait before another auth attempt (0 = go ahead)
+def auth_retry_after(ip, email=None):
+    retry_after = ip_limiter.hit(ip or 'unknown')
+    if not retry_after and email:
+        retry_after = email_limiter.hit(email)
+    return retry_after
+
+
+# ✅ Basic nutrient needs from age, gender, height, weight and goal
+def calculate_nutrient_requirements(age, gender, height, weight, goal):
+    """Calculate basic nutrient needs."""
+    bmr = 10 * weight + 6.25 * height - 5 * age + (5 if gender.lower() == "m" else -161)
+    if goal.lower() == "weight_loss":
+        calories = bmr - 300
+    elif goal.lower() == "muscle_gain":
+        calories = bmr + 300
+    else:
+        calories = bmr
+    protein = (calories * 0.3) / 4
+    fat = (calories * 0.25) / 9
+    carbs = (calories * 0.45) / 4
+    return calories, protein, fat, carbs
+
+
+# ✅ Vectorized nutrient calculation for many profiles at once (same formula as above)
+def calculate_nutrient_requirements_batch(ages, genders, heights, weights, goals):
+    """Calculate basic nutrient needs for arrays of profiles."""
+    ages = np.asarray(ages, dtype=float)
+    heights = np.asarray(heights, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    is_male = np.array([g.lower() == "m" for g in genders], dtype=bool)
+    goals = np.array([g.lower() for g in goals], dtype=object)
+
+    bmr = 10 * weights + 6.25 * heights - 5 * ages + np.where(is_male, 5, -161)
+    calories = bmr + np.select([goals == "weight_loss", goals == "muscle_gain"], [-300, 300], 0)
+    protein = (calories * 0.3) / 4
+    fat = (calories * 0.25) / 9
+    carbs = (calories * 0.45) / 4
+    return calories, protein, fat, carbs
+
+
+# ✅ BMI, BMR and macro targets for a profile (cached, keyed on the normalized inputs)
+def calculate_targets(age, gender, height, weight, goal):
+    key = (int(age), gender.lower(), round(float(height), 2), round(float(weight), 2), goal.lower())
+    targets = targets_cache.get(key)
+    if targets is None:
+        calories, protein, fat, carbs = calculate_nutrient_requirements(age, gender, height, weight, goal)
+        height_in_meters = height / 100
+        targets = {
+            'bmi': weight / (height_in_meters * height_in_meters),
+            'bmr': 10 * weight + 6.25 * height - 5 * age + (5 if gender.lower() in ("m", "male") else -161),
+            'calories': calories,
+            'protein': protein,
+            'fat': fat,
+            'carbs': carbs
+        }
+        targets_cache.set(key, targets)
+    return targets
+
+
+# ✅ Read a prediction profile from request JSON
+def parse_profile(data):
+    return {
+        'name': data.get('name', ''),
+        'gender': data.get('gender', '').lower(),
+        'age': int(data.get('age', 0)),
+        'height': float(data.get('height', 0)),
+        'weight': float(data.get('weight', 0)),
+        'goal': data.get('healthGoal', '').lower().replace(' ', '_'),
+        'food_type': data.get('foodPreferences', ''),
+        'allergies': data.get('allergies', '')
+    }
+
+
+# ✅ Reject profiles whose age/height/weight would make BMI/BMR meaningless (or inf/NaN, which isn't valid JSON)
+def validate_profile(profile):
+    for field in ('age', 'height', 'weight'):
+        value = profile[field]
+        if not math.isfinite(value) or value <= 0:
+            raise ValueError(f'{field.capitalize()} must be a positive number')
+    return profile
+
+
+# ✅ Format meal names: capitalize first letter of each word
+def format_meal_name(meal):
+    return ' '.join(word.capitalize() for word in meal.split())
+
+
+# ✅ Pick a random food from the most common cluster using the precomputed cluster index
+def recommend_food(snapshot, meal, allowed=None):
+    row = model_registry.pick_food(snapshot, meal, allowed)
+    if row is None:
+        raise ValueError('No foods left to recommend after allergy filtering')
+    return model_registry.food_name(snapshot, row)
+
+
+# 'nutrient' matches foods and portions to the macro targets; 'cluster' is the original random cluster sampling
+MEAL_SELECTION_STRATEGY = os.getenv('MEAL_SELECTION_STRATEGY', 'nutrient')
+
+
+# ✅ Pick breakfast, lunch and dinner for the given daily targets
+def recommend_day(snapshot, calories, protein, fat, carbs, allowed=None):
+    """Return {meal: (food, portion_grams)}; portion is None for cluster sampling."""
+    if MEAL_SELECTION_STRATEGY == 'cluster':
+        return {meal: (recommend_food(snapshot, meal, allowed), None) for meal in ['breakfast', 'lunch', 'dinner']}
+    
+    chosen = select_meals(snapshot.macros, snapshot.macros_sq, (calories, protein, fat, carbs), allowed)
+    if chosen is None:
+        raise ValueError('No foods left to recommend after allergy filtering')
+    return {meal: (model_registry.food_name(snapshot, row), grams) for meal, (row, grams) in chosen.items()}
+
+
+# ✅ Combine allergy and veg/nonveg filters into one mask over catalog rows (None = everything allowed)
+VEGETARIAN_PREFERENCES = {'veg', 'vegetarian', 'vegan'}
+
+
+def allowed_for_preferences(snapshot, allergies='', food_type=''):
+    allowed = None
+    if allergies and allergies.lower() != "none" and allergies.strip():
+        allergy_list = [a.strip() for a in allergies.split(",")]
+        allowed = model_registry.allowed_foods(snapshot, allergy_list)
+    if food_type and food_type.strip().lower() in VEGETARIAN_PREFERENCES:
+        allowed = ~snapshot.nonveg if allowed is None else allowed & ~snapshot.nonveg
+    return allowed
+
+
+# ✅ Portion sizes for the JSON responses (grams, rounded)
+def format_portions(day):
+    return {meal: (round(grams) if grams is not None else None) for meal, (_, grams) in day.items()}
+
+
+# ✅ Build the user_data document stored for each recommendation
+def build_user_document(name, gender, age, height, weight, goal, food_type, allergies,
+                        calories, protein, fat, carbs, breakfast, lunch, dinner, user_id=None):
+    user_document = {
+        "name": name,
+        "gender": gender,
+        "age": age,
+        "height": height,
+        "weight": weight,
+        "goal": goal,
+        "food_type": food_type,
+        "allergies": allergies,
+        "calories": calories,
+        "protein": protein,
+        "fat": fat,
+        "carbs": carbs,
+        "breakfast": breakfast,
+        "lunch": lunch,
+        "dinner": dinner,
+        "created_at": datetime.now()
+    }
+    
+    # Add user_id only if provided (for authenticated users)
+    if user_id:
+        user_document["user_id"] = user_id
+    return user_document
+
+
+# Fields the dashboard reads from the latest entry
+DASHBOARD_FIELDS = ["name", "weight", "height", "age", "gender", "goal",
+                    "calories", "protein", "fat", "carbs", "breakfast", "lunch", "dinner"]
+
+
+# ✅ Recommendation for one profile: (user_data document to save, response payload without entry_id)
+def predict_for_profile(profile):
+    validate_profile(profile)
+    name = profile['name']
+    gender = profile['gender']
+    age = profile['age']
+    height = profile['height']
+    weight = profile['weight']
+    goal = profile['goal']
+    food_type = profile['food_type']
+    allergies = profile['allergies']
+
+    # ✅ Shared dataset and models (loaded once per worker)
+    with metrics.stage('snapshot'):
+        snapshot = model_registry.get_snapshot()
+
+    # ✅ Filter allergies if any (precomputed allergen index, no regex scan)
+    allowed = None
+    if allergies and allergies.lower() != "none" and allergies.strip():
+        allergy_list = [a.strip() for a in allergies.split(",")]
+        with metrics.stage('allergen_filter'):
+            allowed = model_registry.allowed_foods(snapshot, allergy_list)
+
+    # ✅ Calculate nutrient needs, BMI and BMR (cached per normalized profile)
+    with metrics.stage('targets'):
+        targets = calculate_targets(age, gender, height, weight, goal)
+    calories, protein, fat, carbs = targets['calories'], targets['protein'], targets['fat'], targets['carbs']
+
+    # ✅ Select meals and portions closest to each meal's share of the targets
+    with metrics.stage('meal_selection'):
+        day = recommend_day(snapshot, calories, protein, fat, carbs, allowed)
+    
+    # ✅ Format meal names: capitalize first letter of each word
+    breakfast = format_meal_name(day['breakfast'][0])
+    lunch = format_meal_name(day['lunch'][0])
+    dinner = format_meal_name(day['dinner'][0])
+
+    user_document = build_user_document(name, gender, age, height, weight, goal, food_type, allergies,
+                                        calories, protein, fat, carbs, breakfast, lunch, dinner)
+    response = {
+        'success': True,
+        'bmi': round(targets['bmi'], 1),
+        'bmr': round(targets['bmr']),
+        'calories': round(calories),
+        'protein': round(protein),
+        'fat': round(fat),
+        'carbs': round(carbs),
+        'meals': [breakfast, lunch, dinner],
+        'breakfast': breakfast,
+        'lunch': lunch,
+        'dinner': dinner,
+        'portions': format_portions(day)
+    }
+    return user_document, response
+
+
+# ✅ Dashboard payload from the latest entry (DASHBOARD_FIELDS) and the weekly history buckets (oldest first);
+# first_weight (from the user's rollup) is the start weight over their whole history
+def dashboard_payload(user_data, history, first_weight=None):
+    # Calculate BMI
+    height_in_meters = user_data['height'] / 100
+    bmi = user_data['weight'] / (height_in_meters * height_in_meters)
+    
+    # Get BMI category
+    if bmi < 18.5:
+        bmi_category = "Underweight"
+    elif bmi < 25:
+        bmi_category = "Normal weight"
+    elif bmi < 30:
+        bmi_category = "Overweight"
+    else:
+        bmi_category = "Obese"
+
+    goal_weight = user_data['weight'] - 5 if 'weight_loss' in user_data['goal'].lower() else user_data['weight']
+    # Estimated resting burn (Mifflin-St Jeor BMR) at a given weight
+    bmr_offset = 6.25 * user_data['height'] - 5 * user_data['age'] + (5 if user_data['gender'].lower() in ("m", "male") else -161)
+
+    if len(history) > 1:
+        # Use actual weekly averages
+        weeks = [(bucket['week'], bucket['weight'], bucket['bmi'], bucket.get('calories')) for bucket in history]
+    else:
+        # Generate simulated data
+        today = datetime.now()
+        weeks = [(today - timedelta(weeks=7 - i), user_data['weight'] - (i * 0.5), None, None) for i in range(8)]
+
+    weight_data = []
+    bmi_data = []
+    calorie_data = []
+    for week, weight, week_bmi, calories in weeks:
+        date = week.strftime('%b %d')
+        weight_data.append({
+            'date': date,
+            'weight': round(weight, 1),
+            'goal': goal_weight
+        })
+        bmi_data.append({
+            'date': date,
+            'bmi': round(week_bmi if week_bmi is not None else weight / (height_in_meters ** 2), 1),
+            'category': bmi_category
+        })
+        calorie_data.append({
+            'date': date,
+            'consumed': round(calories if calories is not None else user_data['calories'], 0),
+            'burned': round(10 * weight + bmr_offset, 0),
+            'target': round(user_data['calories'], 0)
+        })
+
+    # Goal achievements
+    goal_data = [
+        {'goal': 'Daily Steps', 'achieved': 85, 'target': 100},
+        {'goal': 'Water Intake', 'achieved': 92, 'target': 100},
+        {'goal': 'Meal Planning', 'achieved': 78, 'target': 100},
+        {'goal': 'Sleep Hours', 'achieved': 70, 'target': 100},
+        {'goal': 'Exercise', 'achieved': 88, 'target': 100}
+    ]
+
+    current_weight = weight_data[-1]['weight']
+    start_weight = round(first_weight, 1) if first_weight is not None and len(history) > 1 else weight_data[0]['weight']
+    weight_change = start_weight - current_weight
+    goal_progress = ((start_weight - current_weight) / (start_weight - goal_weight) * 100) if (start_weight - goal_weight) > 0 else 0
+
+    return {
+        'success': True,
+        'user': {
+            'name': user_data['name'],
+            'weight': user_data['weight'],
+            'height': user_data['height'],
+            'age': user_data['age'],
+            'gender': user_data['gender'],
+            'goal': user_data['goal']
+        },
+        'stats': {
+            'current_weight': current_weight,
+            'start_weight': start_weight,
+            'weight_change': round(weight_change, 1),
+            'current_bmi': round(bmi, 1),
+            'bmi_category': bmi_category,
+            'goal_progress': round(max(0, min(100, goal_progress)), 0),
+            'tracking_days': len(weight_data) * 7
+        },
+        'charts': {
+            'weight_data': weight_data,
+            'bmi_data': bmi_data,
+            'calorie_data': calorie_data,
+            'goal_data': goal_data
+        },
+        'nutrients': {
+            'calories': round(user_data['calories'], 0),
+            'protein': round(user_data['protein'], 0),
+            'fat': round(user_data['fat'], 0),
+            'carbs': round(user_data['carbs'], 0)
+        },
+        'meals': {
+            'breakfast': user_data['breakfast'],
+            'lunch': user_data['lunch'],
+            'dinner': user_data['dinner']
+        }
+    }
+
+
+# ✅ Look up a meal by name and build its details payload (exact match first, then partial match)
+def meal_details_payload(snapshot, meal_name):
+    # Handle both formatted (e.g., "Margarine With Yoghurt") and unformatted names
+    row = find_meal(snapshot.meal_index, meal_name)
+    if row is None:
+        return {'success': False, 'error': f'Meal "{meal_name}" not found in database'}, 404
+    
+    meal_data = snapshot.catalog.iloc[row]
+    
+    # Format meal name for display
+    meal_name_formatted = format_meal_name(model_registry.food_name(snapshot, row))
+    
+    return {
+        'success': True,
+        'meal': {
+            'name': meal_name_formatted,
+            'calories': round(float(meal_data['Calories (kcal per 100g)']), 1),
+            'protein': round(float(meal_data['Protein (g per 100g)']), 1),
+            'fat': round(float(meal_data['Fat (g per 100g)']), 1),
+            'carbohydrates': round(float(meal_data['Carbohydrates (g per 100g)']), 1),
+            'dietaryFiber': round(float(meal_data['Dietary Fiber (g per 100g)']), 1),
+            'sugars': round(float(meal_data['Sugars (g per 100g)']), 1),
+            'vitaminC': round(float(meal_data['Vitamin C (mg per 100g)']), 2),
+            'vitaminB11': round(float(meal_data['Vitamin B11 (mg per 100g)']), 2),
+            'sodium': round(float(meal_data['Sodium (mg per 100g)']), 2),
+            'calcium': round(float(meal_data['Calcium (mg per 100g)']), 1),
+            'iron': round(float(meal_data['Iron (mg per 100g)']), 2)
+        }
+    }, 200
+
+
+# ✅ Recommendations for a batch request body (a list, or {"profiles": [...]})
+def predict_batch(data):
+    """Return (results, documents, responses).
+
+    ``results`` has one slot per profile, already filled with the error for
+    invalid ones; ``documents`` are the user_data documents to save and
+    ``responses`` the matching (position, payload) pairs still missing their
+    entry_id. Raises ValueError for a malformed request.
+    """
+    items = data.get('profiles') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        raise ValueError('Expected a non-empty list of profiles')
+
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f'At most {MAX_BATCH_SIZE} profiles per batch')
+
+    # ✅ Parse profiles; invalid ones are reported individually
+    results = [None] * len(items)
+    profiles = []
+    positions = []
+    for i, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('Profile must be a JSON object')
+            profiles.append(validate_profile(parse_profile(item)))
+            positions.append(i)
+        except (TypeError, ValueError) as e:
+            results[i] = {'success': False, 'error': str(e)}
+
+    # ✅ One shared catalog/model view for the whole batch
+    snapshot = model_registry.get_snapshot()
+
+    # ✅ Calculate nutrient needs and BMI/BMR for all profiles at once
+    ages = np.array([p['age'] for p in profiles], dtype=float)
+    heights = np.array([p['height'] for p in profiles], dtype=float)
+    weights = np.array([p['weight'] for p in profiles], dtype=float)
+    genders = [p['gender'] for p in profiles]
+    calories, protein, fat, carbs = calculate_nutrient_requirements_batch(
+        ages, genders, heights, weights, [p['goal'] for p in profiles])
+    bmi = weights / (heights / 100) ** 2
+    is_male = np.array([g in ("m", "male") for g in genders], dtype=bool)
+    bmr = 10 * weights + 6.25 * heights - 5 * ages + np.where(is_male, 5, -161)
+
+    # ✅ Select meals per profile
+    documents = []
+    responses = []
+    allowed_by_allergies = {}
+    for j, profile in enumerate(profiles):
+        try:
+            allergies = profile['allergies']
+            allowed = None
+            if allergies and allergies.lower() != "none" and allergies.strip():
+                if allergies not in allowed_by_allergies:
+                    allergy_list = [a.strip() for a in allergies.split(",")]
+                    allowed_by_allergies[allergies] = model_registry.allowed_foods(snapshot, allergy_list)
+                allowed = allowed_by_allergies[allergies]
+
+            day = recommend_day(snapshot, calories[j], protein[j], fat[j], carbs[j], allowed)
+            breakfast = format_meal_name(day['breakfast'][0])
+            lunch = format_meal_name(day['lunch'][0])
+            dinner = format_meal_name(day['dinner'][0])
+        except Exception as e:
+            results[positions[j]] = {'success': False, 'error': str(e)}
+            continue
+
+        documents.append(build_user_document(
+            profile['name'], profile['gender'], profile['age'], profile['height'], profile['weight'],
+            profile['goal'], profile['food_type'], allergies,
+            float(calories[j]), float(protein[j]), float(fat[j]), float(carbs[j]),
+            breakfast, lunch, dinner))
+        responses.append((positions[j], {
+            'success': True,
+            'bmi': round(float(bmi[j]), 1),
+            'bmr': round(float(bmr[j])),
+            'calories': round(float(calories[j])),
+            'protein': round(float(protein[j])),
+            'fat': round(float(fat[j])),
+            'carbs': round(float(carbs[j])),
+            'meals': [breakfast, lunch, dinner],
+            'breakfast': breakfast,
+            'lunch': lunch,
+            'dinner': dinner,
+            'portions': format_portions(day)
+        }))
+    return results, documents, responses
+
+
+# ✅ Weekly meal plan payload for a request body - 7 days of breakfast/lunch/dinner in one call
+def week_plan_payload(data):
+    profile = parse_profile(data)
+    days = max(1, min(int(data.get('days', 7)), MAX_PLAN_DAYS))
+    no_repeat_days = max(1, int(data.get('noRepeatDays', 7)))
+
+    snapshot = model_registry.get_snapshot()
+    allowed = allowed_for_preferences(snapshot, profile['allergies'], profile['food_type'])
+
+    # ✅ Daily targets, same as /api/predict
+    calories, protein, fat, carbs = calculate_nutrient_requirements(
+        profile['age'], profile['gender'], profile['height'], profile['weight'], profile['goal'])
+
+    plan = plan_week(snapshot.macros, snapshot.macros_sq, (calories, protein, fat, carbs),
+                     days=days, allowed=allowed, no_repeat_days=no_repeat_days)
+    if plan is None:
+        return {'success': False, 'error': 'No foods left to recommend after filtering'}, 400
+
+    plan_days = []
+    for day, day_plan in enumerate(plan, start=1):
+        totals = np.zeros(4)
+        meals = {}
+        for meal, (row, grams) in day_plan.items():
+            totals += snapshot.macros[row] * (grams / 100)
+            meals[meal] = {'name': format_meal_name(model_registry.food_name(snapshot, row)), 'portion': round(grams)}
+        plan_days.append({
+            'day': day,
+            'meals': meals,
+            'totals': {
+                'calories': round(float(totals[0])),
+                'protein': round(float(totals[1])),
+                'fat': round(float(totals[2])),
+                'carbs': round(float(totals[3]))
+            }
+        })
+
+    return {
+        'success': True,
+        'targets': {
+            'calories': round(calories),
+            'protein': round(protein),
+            'fat': round(fat),
+            'carbs': round(carbs)
+        },
+        'days': plan_days
+    }, 200
+
+
+# ✅ Similar meals (nearest neighbours by nutrient profile) that pass the allergy/veg filters
+def meal_alternatives_payload(meal_name, k, allergies='', food_type=''):
+    snapshot = model_registry.get_snapshot()
+    row = find_meal(snapshot.meal_index, meal_name)
+    if row is None:
+        return {'success': False, 'error': f'Meal "{meal_name}" not found in database'}, 404
+
+    allowed = allowed_for_preferences(snapshot, allergies, food_type)
+    catalog = snapshot.catalog
+    alternatives = []
+    for alt_row, distance in model_registry.similar_foods(snapshot, row, k, allowed):
+        food = catalog.iloc[alt_row]
+        alternatives.append({
+            'name': format_meal_name(model_registry.food_name(snapshot, alt_row)),
+            'distance': round(distance, 3),
+            'calories': round(float(food['Calories (kcal per 100g)']), 1),
+            'protein': round(float(food['Protein (g per 100g)']), 1),
+            'fat': round(float(food['Fat (g per 100g)']), 1),
+            'carbohydrates': round(float(food['Carbohydrates (g per 100g)']), 1)
+        })
+
+    return {
+        'success': True,
+        'meal': format_meal_name(model_registry.food_name(snapshot, row)),
+        'alternatives': alternatives
+    }, 200
+
+
+# ✅ Load the catalog and models and run each recommendation path once, so the first real
+# request of a worker doesn't pay for lazy loading, index pages or first-call overhead
+WARM_UP_PROFILE = {'name': 'warm-up', 'gender': 'female', 'age': 30, 'height': 165.0, 'weight': 60.0,
+                   'healthGoal': 'maintenance', 'foodPreferences': 'veg', 'allergies': 'nuts'}
+
+
+def warm_up():
+    with metrics.stage('warm_up'):
+        snapshot = model_registry.warm_up()
+        profile = parse_profile(WARM_UP_PROFILE)
+        calories, protein, fat, carbs = calculate_nutrient_requirements(
+            profile['age'], profile['gender'], profile['height'], profile['weight'], profile['goal'])
+        allowed_for_preferences(snapshot, profile['allergies'], profile['food_type'])
+        recommend_day(snapshot, calories, protein, fat, carbs)
+        recommend_food(snapshot, 'breakfast')
+        week_plan_payload(WARM_UP_PROFILE)
+        meal = model_registry.food_name(snapshot, 0)
+        meal_details_payload(snapshot, meal)
+        meal_alternatives_payload(meal, 5, profile['allergies'], profile['food_type'])
+    return snapshot
+
+
+# ✅ Warm-up per worker (reloaded automatically when files change): retried in a background
+# thread until it succeeds, and /readyz stays 503 until then. WARM_UP_ENABLED=0 skips it:
+# the worker counts as warm and the first request that needs the models loads them.
+WARM_UP_ENABLED = os.getenv('WARM_UP_ENABLED', '1') != '0'
+WARM_UP_RETRY_SECONDS = float(os.getenv('WARM_UP_RETRY_SECONDS', '30'))
+
+
+class WarmUpTask:
+    def __init__(self, enabled=WARM_UP_ENABLED, retry_seconds=WARM_UP_RETRY_SECONDS):
+        self.retry_seconds = retry_seconds
+        self.warm = not enabled
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        try:
+            warm_up()
+        except Exception as e:
+            self.error = str(e)
+            print(f"[WARNING] Catalog/models not loaded, retrying in {self.retry_seconds:.0f}s: {e}")
+            return False
+        self.warm, self.error = True, None
+        print("[OK] Catalog and models loaded")
+        return True
+
+    def _run(self):
+        while not self.warm and not self._stop.is_set():
+            if not self.run_once():
+                self._stop.wait(self.retry_seconds)
+
+    def start(self, in_background=True):
+        """Warm up in a background thread (or try once right here first) until it has succeeded."""
+        self._stop = threading.Event()
+        if self.warm or (not in_background and self.run_once()):
+            return
+        self._thread = threading.Thread(target=self._run, name='warm-up', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+# ✅ Recommendation documents are written behind the request by a background flusher; while
+# MongoDB is unavailable they are journaled (shared by all workers) and replayed once it is back
+WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', '1') != '0'
+
+
+def build_write_queue(get_collection, on_flush):
+    """WriteBehindQueue configured from the WRITE_BEHIND_* environment variables.
+
+    ``get_collection`` returns a blocking pymongo collection (the flusher is a thread), or None
+    while MongoDB is unavailable.
+    """
+    return WriteBehindQueue(
+        get_collection=get_collection,
+        journal_path=os.getenv('WRITE_BEHIND_JOURNAL', 'database/pending_user_data.jsonl'),
+        maxsize=int(os.getenv('WRITE_BEHIND_QUEUE_SIZE', '10000')),
+        batch_size=int(os.getenv('WRITE_BEHIND_BATCH_SIZE', '100')),
+        flush_interval=float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', '0.5')),
+        on_flush=on_flush
+    )
+
+
+# ✅ Liveness payload: the process answers (degraded or not), with what is missing
+def health_payload(warm_up_task, mongo, connected, write_queue):
+    queue_stats = write_queue.stats()
+    return {
+        'status': 'ok' if warm_up_task.warm and connected else 'degraded',
+        'warm': warm_up_task.warm,
+        'warm_up_error': warm_up_task.error,
+        'mongodb': mongo.stats() if mongo is not None else {'status': 'not_started'},
+        'write_queue': {
+            'queue_depth': queue_stats['queue_depth'],
+            'journal_pending': queue_stats['journal_pending']
+        }
+    }
+
+
+# ✅ Readiness payload: 200 only once the worker is warm and connected to MongoDB, 503 otherwise,
+# so the load balancer routes around workers that are starting up or running degraded
+def readiness_payload(warm_up_task, mongo, connected):
+    mongodb = mongo.status if mongo is not None else 'not_started'
+    reasons = []
+    if not warm_up_task.warm:
+        reasons.append('warming up')
+    if not connected:
+        reasons.append(f'mongodb {mongodb}')
+    return {
+        'ready': not reasons,
+        'warm': warm_up_task.warm,
+        'mongodb': mongodb,
+        'reasons': reasons
+    }, 503 if reasons else 200
+
+
+# ✅ Password hashing pool and auth throttling status
+def auth_stats_payload():
+    return {
+        'success': True,
+        'password_pool': password_pool.stats(),
+        'ip_limiter': ip_limiter.stats(),
+        'email_limiter': email_limiter.stats()
+    }
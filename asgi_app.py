@@ -0,0 +1,701 @@
+# asgi_app.py
+"""ASGI serving mode: the same API as app.py on Quart with the motor async MongoDB driver.
+
+While a request waits on MongoDB the event loop serves other requests, so a
+single process can hold many concurrent dashboard and prediction requests.
+All requests in a worker share one motor connection pool (MONGO_MAX_POOL_SIZE).
+Password hashing runs on the bounded password pool, off the loop; the numpy
+meal selection is fast enough to run inline. Changed catalog/model files are
+reloaded in a thread by a background task, never inside a request. Payloads
+come from api_core, like in app.py, so both modes keep the same route contracts.
+
+The background services are the ones app.py runs: a MongoSupervisor thread
+connects and reconnects with backoff and switches the motor collections off
+while MongoDB is down (database-backed routes answer 503), recommendation
+documents go through the shared write-behind queue and journal, and /readyz
+stays 503 until the worker is warm and connected.
+
+    pip install -r requirements-asgi.txt
+    hypercorn asgi_app:app --bind 0.0.0.0:5000
+"""
+import asyncio
+import math
+import os
+import secrets
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from hypercorn.middleware import ProxyFixMiddleware
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
+from quart import Quart, g, jsonify, render_template, request, session
+from quart_cors import cors
+
+import metrics
+import model_registry
+from api_core import (dashboard_payload, meal_alternatives_payload, meal_details_payload, parse_profile,
+                      predict_batch, predict_for_profile, recommend_day, week_plan_payload,
+                      auth_retry_after, build_user_document, calculate_nutrient_requirements,
+                      cache_user_profile, email_limiter, invalidate_user_profile, password_pool,
+                      targets_cache, user_cache, auth_stats_payload, build_write_queue, health_payload,
+                      readiness_payload, WarmUpTask,
+                      DASHBOARD_FIELDS, MAX_ALTERNATIVES, TRUSTED_PROXY_HOPS, WRITE_BEHIND_ENABLED)
+from cache import TTLCache
+from dashboard_aggregation import fetch_weekly_history_async
+from database.connection import MONGODB_DB_NAME, MONGODB_URI
+from database.mongo_indexes import ensure_indexes_async
+from mongo_supervisor import MongoSupervisor
+from password_pool import PasswordPoolBusy
+from user_rollups import (ROLLUPS_COLLECTION, dashboard_projection, rollup_history, update_rollups,
+                          update_rollups_async)
+
+load_dotenv()
+
+app = Quart(__name__)
+app.secret_key = os.getenv('SECRET_KEY', secrets.token_hex(32))
+app = cors(app, allow_credentials=True, allow_origin=['http://localhost:8080', 'http://localhost:3000'])
+
+# Behind a reverse proxy, take the client address (used by the auth rate limits) from X-Forwarded-For
+if TRUSTED_PROXY_HOPS:
+    app.asgi_app = ProxyFixMiddleware(app.asgi_app, mode='legacy', trusted_hops=TRUSTED_PROXY_HOPS)
+
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '100'))
+
+# Same per-worker dashboard cache as app.py
+dashboard_cache = TTLCache(int(os.getenv('DASHBOARD_CACHE_SIZE', '1024')),
+                           float(os.getenv('DASHBOARD_CACHE_TTL', '30')))
+
+# Created in the serving loop (motor binds to the event loop it is first used on) once the
+# supervisor has reached MongoDB; the collections are None while it is unavailable
+client = None
+db = None
+collection = None
+users_collection = None
+rollups_collection = None
+serving_loop = None
+mongo = None  # MongoSupervisor, created at startup
+# Blocking collections of the supervisor's pymongo client, for the write-behind flusher thread
+write_collection = None
+write_rollups_collection = None
+reload_task = None
+
+# Catalog and models are loaded and every recommendation path run once per worker, in a thread
+warm_up_task = WarmUpTask()
+
+
+async def publish_collections():
+    """Publish the motor collections (the supervisor has just reached MongoDB)."""
+    global client, db, collection, users_collection, rollups_collection
+    if client is None:
+        client = AsyncIOMotorClient(MONGODB_URI, maxPoolSize=MONGO_MAX_POOL_SIZE)
+    new_db = client[MONGODB_DB_NAME]
+    try:
+        await ensure_indexes_async(new_db)
+    except Exception as e:
+        print(f"[WARNING] Could not create MongoDB indexes: {e}")
+    if write_collection is None:
+        return  # lost again while the indexes were being created
+    db = new_db
+    users_collection = db['users']
+    rollups_collection = db[ROLLUPS_COLLECTION]
+    collection = db['user_data']
+
+
+def clear_collections():
+    """Switch to degraded mode until the supervisor reconnects."""
+    global collection, users_collection, rollups_collection
+    collection = users_collection = rollups_collection = None
+
+
+# Supervisor callbacks run on its thread: the motor side is handed to the serving loop
+def on_mongodb_connected(sync_client):
+    global write_collection, write_rollups_collection
+    sync_db = sync_client[MONGODB_DB_NAME]
+    write_rollups_collection = sync_db[ROLLUPS_COLLECTION]
+    write_collection = sync_db['user_data']
+    asyncio.run_coroutine_threadsafe(publish_collections(), serving_loop)
+    if WRITE_BEHIND_ENABLED:
+        write_queue.replay()
+
+
+def on_mongodb_disconnected():
+    global write_collection, write_rollups_collection
+    write_collection = write_rollups_collection = None
+    serving_loop.call_soon_threadsafe(clear_collections)
+
+
+@app.before_serving
+async def startup():
+    global serving_loop, mongo, reload_task
+    serving_loop = asyncio.get_running_loop()
+    mongo = MongoSupervisor(MONGODB_URI, on_mongodb_connected, on_mongodb_disconnected)
+    mongo.start()
+    warm_up_task.start()
+
+    # Changed catalog/model files are picked up by a background task, off the loop
+    model_registry.use_background_reload()
+    reload_task = asyncio.create_task(reload_models())
+
+
+async def reload_models():
+    while True:
+        await asyncio.sleep(model_registry.RELOAD_CHECK_INTERVAL)
+        try:
+            await asyncio.to_thread(model_registry.refresh_snapshot)
+        except Exception as e:
+            print(f"[WARNING] Catalog/models not loaded, will retry: {e}")
+
+
+@app.after_serving
+async def shutdown():
+    global write_collection, write_rollups_collection
+    if reload_task is not None:
+        reload_task.cancel()
+    if WRITE_BEHIND_ENABLED:
+        await asyncio.to_thread(write_queue.flush)
+    await asyncio.to_thread(warm_up_task.stop)
+    if mongo is not None:
+        await asyncio.to_thread(mongo.stop)
+    write_collection = write_rollups_collection = None
+    clear_collections()
+    if client is not None:
+        client.close()
+
+
+# Request latency and in-flight metrics (async hooks; metrics.init_app is Flask-only)
+if metrics.METRICS_ENABLED:
+    @app.before_request
+    async def metrics_before_request():
+        metrics.in_flight.inc()
+        g._metrics_in_flight = True
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    async def metrics_after_request(response):
+        start = g.pop('_metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            metrics.request_seconds.observe(time.perf_counter() - start, request.method, route,
+                                            str(response.status_code))
+        return response
+
+    @app.teardown_request
+    async def metrics_teardown_request(exc):
+        if g.pop('_metrics_in_flight', False):
+            metrics.in_flight.dec()
+
+    @app.route('/metrics', methods=['GET'])
+    async def metrics_endpoint():
+        return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def invalidate_user_caches(user_documents):
+    for user_document in user_documents:
+        user_id = user_document.get("user_id")
+        if user_id:
+            dashboard_cache.delete(str(user_id))
+
+
+def after_user_data_written(user_documents):
+    """Fold documents the write-behind flusher inserted into the rollups, then drop stale dashboards."""
+    update_rollups(write_rollups_collection, user_documents)
+    invalidate_user_caches(user_documents)
+
+
+# Recommendation documents are written behind the request by a background flusher (see api_core)
+write_queue = build_write_queue(lambda: write_collection, after_user_data_written)
+
+
+# ✅ Save user_data documents (MongoDB) - ids are generated here so the client gets stable entry_ids
+async def save_user_documents(user_documents):
+    if not user_documents:
+        return []
+
+    for user_document in user_documents:
+        user_document["_id"] = ObjectId()
+    entry_ids = [str(user_document["_id"]) for user_document in user_documents]
+    if WRITE_BEHIND_ENABLED or collection is None:
+        # Degraded mode: the write-behind queue journals them until MongoDB is back
+        write_queue.put_many(user_documents)
+        return entry_ids
+
+    try:
+        with metrics.mongo('insert_many', 'user_data'):
+            await collection.insert_many(user_documents, ordered=False)
+        await update_rollups_async(rollups_collection, user_documents)
+        invalidate_user_caches(user_documents)
+    except Exception as e:
+        # A partly applied insert_many is fine: the replay skips documents that are already in
+        print(f"[WARNING] Error saving to MongoDB, queued for retry: {e}")
+        write_queue.put_many(user_documents)
+    return entry_ids
+
+
+def _with_id(user_doc):
+    if user_doc and "_id" in user_doc:
+        user_doc["id"] = str(user_doc["_id"])
+        del user_doc["_id"]
+    return user_doc
+
+
+# ✅ Latest user_data entry (for one user, or by entry id)
+async def get_user_data(user_id=None, entry_id=None, projection=None):
+    if collection is None:
+        return None
+
+    if entry_id:
+        try:
+            query = {"_id": ObjectId(entry_id)}
+        except Exception:
+            return None
+        with metrics.mongo('find_one', 'user_data'):
+            user_doc = await collection.find_one(query, projection)
+    elif user_id:
+        with metrics.mongo('find_one', 'user_data'):
+            user_doc = await collection.find_one({"user_id": user_id}, projection, sort=[("created_at", -1)])
+    else:
+        return None
+    return _with_id(user_doc) if user_doc else None
+
+
+# ✅ A user's rollup document (see user_rollups)
+async def get_rollup(user_id, projection=None):
+    if rollups_collection is None:
+        return None
+    with metrics.mongo('find_one', ROLLUPS_COLLECTION):
+        return await rollups_collection.find_one({"_id": user_id}, projection)
+
+
+# ✅ Weekly averages of a user's entries (see dashboard_aggregation)
+async def get_weekly_history(user_id):
+    if collection is None:
+        return []
+    return await fetch_weekly_history_async(collection, user_id)
+
+
+@app.route('/')
+async def home():
+    return await render_template('index.html')
+
+
+def get_current_user_id():
+    """Get current logged-in user ID from session."""
+    return session.get('user_id')
+
+
+def too_many_attempts(retry_after):
+    response = jsonify({'success': False, 'error': 'Too many attempts, please try again later'})
+    return response, 429, {'Retry-After': str(math.ceil(retry_after))}
+
+
+def hashing_busy(e):
+    return jsonify({'success': False, 'error': str(e)}), 503, {'Retry-After': '1'}
+
+
+# Same degraded-mode response as app.py for database-backed routes while MongoDB is unavailable
+DEGRADED_RETRY_AFTER = os.getenv('DEGRADED_RETRY_AFTER', '5')
+
+
+def database_unavailable():
+    response = jsonify({'success': False, 'error': 'Database temporarily unavailable', 'degraded': True})
+    return response, 503, {'Retry-After': DEGRADED_RETRY_AFTER}
+
+
+# ✅ Sign Up endpoint
+@app.route('/api/auth/signup', methods=['POST'])
+async def api_signup():
+    try:
+        data = await request.get_json()
+        name = data.get('name', '').strip()
+        email = data.get('email', '').strip().lower()
+        password = data.get('password', '').strip()
+
+        if not name or not email or not password:
+            return jsonify({'success': False, 'error': 'All fields are required'}), 400
+
+        if len(password) < 6:
+            return jsonify({'success': False, 'error': 'Password must be at least 6 characters'}), 400
+
+        retry_after = auth_retry_after(request.remote_addr)
+        if retry_after:
+            return too_many_attempts(retry_after)
+
+        if users_collection is None:
+            return database_unavailable()
+
+        with metrics.mongo('find_one', 'users'):
+            existing_user = await users_collection.find_one({"email": email})
+        if existing_user:
+            return jsonify({'success': False, 'error': 'Email already registered'}), 400
+
+        hashed_password = await password_pool.hash_async(password)
+        user_doc = {
+            "name": name,
+            "email": email,
+            "password": hashed_password,
+            "created_at": datetime.now()
+        }
+
+        try:
+            with metrics.mongo('insert_one', 'users'):
+                result = await users_collection.insert_one(user_doc)
+        except DuplicateKeyError:
+            return jsonify({'success': False, 'error': 'Email already registered'}), 400
+        user_id = str(result.inserted_id)
+        cache_user_profile(user_id, user_doc)
+
+        session['user_id'] = user_id
+        session['user_email'] = email
+        session['user_name'] = name
+
+        return jsonify({
+            'success': True,
+            'user_id': user_id,
+            'name': name,
+            'email': email
+        })
+    except PasswordPoolBusy as e:
+        return hashing_busy(e)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# ✅ Sign In endpoint
+@app.route('/api/auth/signin', methods=['POST'])
+async def api_signin():
+    try:
+        data = await request.get_json()
+        email = data.get('email', '').strip().lower()
+        password = data.get('password', '').strip()
+
+        if not email or not password:
+            return jsonify({'success': False, 'error': 'Email and password are required'}), 400
+
+        retry_after = auth_retry_after(request.remote_addr, email)
+        if retry_after:
+            return too_many_attempts(retry_after)
+
+        if users_collection is None:
+            return database_unavailable()
+
+        with metrics.mongo('find_one', 'users'):
+            user = await users_collection.find_one({"email": email})
+        if not user:
+            return jsonify({'success': False, 'error': 'Invalid email or password'}), 401
+
+        if not await password_pool.check_async(user['password'], password):
+            return jsonify({'success': False, 'error': 'Invalid email or password'}), 401
+        email_limiter.reset(email)
+
+        user_id = str(user['_id'])
+        cache_user_profile(user_id, user)
+        session['user_id'] = user_id
+        session['user_email'] = email
+        session['user_name'] = user.get('name', '')
+
+        return jsonify({
+            'success': True,
+            'user_id': user_id,
+            'name': user.get('name', ''),
+            'email': email
+        })
+    except PasswordPoolBusy as e:
+        return hashing_busy(e)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# ✅ Sign Out endpoint
+@app.route('/api/auth/signout', methods=['POST'])
+async def api_signout():
+    user_id = get_current_user_id()
+    if user_id:
+        invalidate_user_profile(user_id)
+    session.clear()
+    return jsonify({'success': True, 'message': 'Signed out successfully'})
+
+
+# ✅ Check authentication status
+@app.route('/api/auth/me', methods=['GET'])
+async def api_me():
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({'success': False, 'authenticated': False}), 401
+
+    profile = user_cache.get(user_id)
+    if profile is None:
+        if users_collection is None:
+            return database_unavailable()
+
+        try:
+            with metrics.mongo('find_one', 'users'):
+                user = await users_collection.find_one({"_id": ObjectId(user_id)}, {"name": 1, "email": 1})
+        except Exception:
+            session.clear()
+            return jsonify({'success': False, 'authenticated': False}), 401
+        if not user:
+            session.clear()
+            return jsonify({'success': False, 'authenticated': False}), 401
+        profile = cache_user_profile(user_id, user)
+
+    return jsonify({
+        'success': True,
+        'authenticated': True,
+        'user_id': user_id,
+        'name': profile['name'],
+        'email': profile['email']
+    })
+
+
+# ✅ API endpoint for predictions (JSON) - no authentication required
+@app.route('/api/predict', methods=['POST'])
+async def api_predict():
+    try:
+        if not request.is_json:
+            return jsonify({'success': False, 'error': 'Content-Type must be application/json'}), 400
+
+        data = await request.get_json()
+        if not data:
+            return jsonify({'success': False, 'error': 'No JSON data provided'}), 400
+
+        user_document, response = predict_for_profile(parse_profile(data))
+        with metrics.stage('save_user_data'):
+            response['entry_id'] = (await save_user_documents([user_document]))[0]
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+# ✅ Batch API endpoint for predictions - many profiles in one call
+@app.route('/api/predict/batch', methods=['POST'])
+async def api_predict_batch():
+    try:
+        if not request.is_json:
+            return jsonify({'success': False, 'error': 'Content-Type must be application/json'}), 400
+
+        data = await request.get_json()
+        results, documents, responses = predict_batch(data)
+
+        entry_ids = await save_user_documents(documents)
+        for (position, response), entry_id in zip(responses, entry_ids):
+            response['entry_id'] = entry_id
+            results[position] = response
+
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'succeeded': len(responses),
+            'results': results
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+# ✅ Weekly meal plan - 7 days of breakfast/lunch/dinner in one call
+@app.route('/api/plan/week', methods=['POST'])
+async def api_plan_week():
+    try:
+        if not request.is_json:
+            return jsonify({'success': False, 'error': 'Content-Type must be application/json'}), 400
+
+        data = await request.get_json()
+        if not data:
+            return jsonify({'success': False, 'error': 'No JSON data provided'}), 400
+
+        payload, status = week_plan_payload(data)
+        return jsonify(payload), status
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
+# ✅ Build and serialize the dashboard payload from the rollup, else latest entry + weekly history (fetched concurrently)
+async def build_dashboard_response(user_id):
+    rollup = await get_rollup(user_id, dashboard_projection(DASHBOARD_FIELDS)) if user_id else None
+    if rollup and rollup.get("latest"):
+        payload = dashboard_payload(rollup["latest"], rollup_history(rollup), rollup.get("first_weight"))
+        return app.json.dumps(payload) + "\n", 200
+
+    # No rollup yet (entries written before rollups existed): latest entry + aggregation
+    if not user_id:
+        user_data, history = None, []
+    else:
+        user_data, history = await asyncio.gather(
+            get_user_data(user_id, projection=DASHBOARD_FIELDS),
+            get_weekly_history(user_id))
+
+    if not user_data:
+        payload = {
+            'success': False,
+            'message': 'No user data found'
+        }
+        return app.json.dumps(payload) + "\n", 404
+    return app.json.dumps(dashboard_payload(user_data, history)) + "\n", 200
+
+
+# ✅ API endpoint for dashboard data (cached per user until their next entry)
+@app.route('/api/dashboard', methods=['GET'])
+async def api_dashboard():
+    try:
+        user_id = request.args.get('user_id', type=str)
+        cached = dashboard_cache.get(user_id) if user_id else None
+        if cached is None:
+            if collection is None:
+                return database_unavailable()
+            cached = await build_dashboard_response(user_id)
+            if user_id:
+                dashboard_cache.set(user_id, cached)
+
+        body, status = cached
+        return app.response_class(body, status=status, mimetype=app.json.mimetype)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# ✅ API endpoint to get meal details
+@app.route('/api/meal-details', methods=['GET'])
+async def api_meal_details():
+    try:
+        meal_name = request.args.get('meal', '').strip()
+        if not meal_name:
+            return jsonify({'success': False, 'error': 'Meal name is required'}), 400
+
+        snapshot = model_registry.get_snapshot()
+        cached = snapshot.meal_details_cache.get(meal_name)
+        if cached is None:
+            payload, status = meal_details_payload(snapshot, meal_name)
+            cached = (app.json.dumps(payload) + "\n", status)
+            snapshot.meal_details_cache.set(meal_name, cached)
+
+        body, status = cached
+        return app.response_class(body, status=status, mimetype=app.json.mimetype)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# ✅ Response cache hit/miss counters
+@app.route('/api/stats/cache', methods=['GET'])
+async def api_cache_stats():
+    snapshot = model_registry.get_snapshot()
+    return jsonify({
+        'success': True,
+        'caches': {
+            'targets': targets_cache.stats(),
+            'dashboard': dashboard_cache.stats(),
+            'users': user_cache.stats(),
+            'meal_details': snapshot.meal_details_cache.stats()
+        }
+    })
+
+
+# ✅ Write-behind queue status (depth, flush latency, journaled documents)
+@app.route('/api/stats/write-queue', methods=['GET'])
+async def api_write_queue_stats():
+    return jsonify({'success': True, 'enabled': WRITE_BEHIND_ENABLED, 'stats': write_queue.stats()})
+
+
+# ✅ Password hashing pool and auth throttling status
+@app.route('/api/stats/auth', methods=['GET'])
+async def api_auth_stats():
+    return jsonify(auth_stats_payload())
+
+
+# ✅ Liveness probe: 200 while the process can answer at all (degraded or not), with what is missing
+@app.route('/healthz', methods=['GET'])
+async def healthz():
+    return jsonify(health_payload(warm_up_task, mongo, collection is not None, write_queue))
+
+
+# ✅ Readiness probe: 200 only once this worker is warm and connected to MongoDB, 503 otherwise
+@app.route('/readyz', methods=['GET'])
+async def readyz():
+    payload, status = readiness_payload(warm_up_task, mongo, collection is not None)
+    return jsonify(payload), status
+
+
+# ✅ API endpoint for similar meals (nearest neighbours by nutrient profile)
+@app.route('/api/meal-alternatives', methods=['GET'])
+async def api_meal_alternatives():
+    try:
+        meal_name = request.args.get('meal', '').strip()
+        if not meal_name:
+            return jsonify({'success': False, 'error': 'Meal name is required'}), 400
+
+        k = max(1, min(request.args.get('k', 5, type=int), MAX_ALTERNATIVES))
+        allergies = request.args.get('allergies', '')
+        food_type = request.args.get('food_type', request.args.get('foodPreferences', ''))
+
+        payload, status = meal_alternatives_payload(meal_name, k, allergies, food_type)
+        return jsonify(payload), status
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# ✅ API endpoint to get latest user
+@app.route('/api/user/latest', methods=['GET'])
+async def api_user_latest():
+    try:
+        # Only the signed-in user's own data; ?user_id is accepted if it names that user
+        user_id = get_current_user_id()
+        if not user_id:
+            return jsonify({'success': False, 'error': 'Authentication required'}), 401
+        if request.args.get('user_id', user_id, type=str) != user_id:
+            return jsonify({'success': False, 'error': 'Forbidden'}), 403
+        if collection is None:
+            return database_unavailable()
+        rollup = await get_rollup(user_id, {"latest": 1})
+        user_data = rollup.get("latest") if rollup else None
+        if not user_data:
+            user_data = await get_user_data(user_id)
+        if not user_data:
+            return jsonify({'success': False, 'message': 'No user data found'}), 404
+
+        return jsonify({'success': True, 'user': user_data})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+# ✅ Legacy route for form submission (kept for backward compatibility)
+@app.route('/predict', methods=['POST'])
+async def predict():
+    form = await request.form
+    name = form['name']
+    gender = form['gender']
+    age = int(form['age'])
+    height = float(form['height'])
+    weight = float(form['weight'])
+    goal = form['goal']
+    food_type = form['food_type']
+    allergies = form.get('allergies', '')
+
+    snapshot = model_registry.get_snapshot()
+
+    allowed = None
+    if allergies and allergies.lower() != "none":
+        allergy_list = [a.strip() for a in allergies.split(",")]
+        allowed = model_registry.allowed_foods(snapshot, allergy_list)
+
+    calories, protein, fat, carbs = calculate_nutrient_requirements(age, gender, height, weight, goal)
+
+    day = recommend_day(snapshot, calories, protein, fat, carbs, allowed)
+    breakfast = day['breakfast'][0]
+    lunch = day['lunch'][0]
+    dinner = day['dinner'][0]
+
+    await save_user_documents([build_user_document(name, gender, age, height, weight, goal, food_type, allergies,
+                                                   calories, protein, fat, carbs, breakfast, lunch, dinner)])
+
+    return await render_template('index.html',
+                                 name=name,
+                                 calories=round(calories),
+                                 protein=round(protein),
+                                 fat=round(fat),
+                                 carbs=round(carbs),
+                                 breakfast=breakfast,
+                                 lunch=lunch,
+                                 dinner=dinner)
+
+
+if __name__ == '__main__':
+    app.run(debug=True, port=5000, host='0.0.0.0')
@@ -0,0 +1,66 @@
+# benchmarks/bench_allergen_filter.py
+"""Compare the per-request cost of allergy filtering: regex scan vs. allergen index.
+
+The index is timed twice: cold (every lookup scans the token postings, as for
+a term the worker has not seen yet) and cached (per-term results kept in an
+LRUCache, as model_registry does for each snapshot). Run from the repository
+root:
+
+    python -m benchmarks.bench_allergen_filter
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from cache import LRUCache
+from scripts.preprocess_data import build_allergen_index, excluded_food_ids
+
+ALLERGENS = [
+    "milk", "egg", "peanut", "wheat", "soy", "fish", "shrimp", "almond", "cashew", "walnut",
+    "sesame", "cheese", "butter", "cream", "yogurt", "crab", "lobster", "oat", "corn", "honey",
+]
+
+REPEATS = 200
+
+
+def regex_mask(df, allergy_list):
+    """The original request path: one regex over the whole food column."""
+    return ~df['food'].str.contains('|'.join(allergy_list), case=False, na=False).to_numpy()
+
+
+def index_mask(index, n_foods, allergy_list, cache=None):
+    allowed = np.ones(n_foods, dtype=bool)
+    allowed[excluded_food_ids(index, allergy_list, cache)] = False
+    return allowed
+
+
+def time_per_call(fn):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn()
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def main():
+    df = pd.read_csv("data/processed_diet.csv")
+    index = build_allergen_index(df["food"].tolist())
+
+    print(f"Catalog: {len(df)} foods, {len(index['tokens'])} tokens, {REPEATS} repeats")
+    print(f"{'allergens':>10} {'regex (ms)':>12} {'cold (ms)':>11} {'speedup':>9} {'cached (ms)':>12} {'speedup':>9}")
+    for n in [1, 5, 20]:
+        allergy_list = ALLERGENS[:n]
+        # Results must agree before timings mean anything
+        assert (regex_mask(df, allergy_list) == index_mask(index, len(df), allergy_list)).all()
+
+        cache = LRUCache()
+        regex_ms = time_per_call(lambda: regex_mask(df, allergy_list))
+        cold_ms = time_per_call(lambda: index_mask(index, len(df), allergy_list))
+        cached_ms = time_per_call(lambda: index_mask(index, len(df), allergy_list, cache))
+        print(f"{n:>10} {regex_ms:>12.3f} {cold_ms:>11.3f} {regex_ms / cold_ms:>8.1f}x "
+              f"{cached_ms:>12.3f} {regex_ms / cached_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
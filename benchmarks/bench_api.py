@@ -0,0 +1,371 @@
+# benchmarks/bench_api.py
+"""Load-test the Flask API and keep the results for comparison between commits.
+
+Drives /api/predict, /api/meal-details, /api/dashboard and the auth
+endpoints either through Flask's test client (in-process, no network) or
+through a real threaded WSGI server on localhost, and reports throughput,
+p50/p95/p99 latency and the worker's memory. MongoDB is replaced by
+mongomock (``pip install mongomock``), or by a throwaway database on a local
+mongod when MONGODB_TEST_URI is set. Run from the repository root:
+
+    python -m benchmarks.bench_api
+    python -m benchmarks.bench_api --server --concurrency 8 --requests 2000
+    MONGODB_TEST_URI=mongodb://localhost:27017 python -m benchmarks.bench_api
+
+Each run is written to benchmarks/results/ and compared with the previous
+run of the same mode; endpoints whose p95 got more than --threshold percent
+slower, or that returned unexpected statuses, are flagged and the exit status
+is 1.
+"""
+import argparse
+import glob
+import http.client
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.cookies import SimpleCookie
+from urllib.parse import quote
+
+import numpy as np
+
+RESULTS_DIR = "benchmarks/results"
+DB_NAME = "NutriDiet_api_benchmark"
+
+BENCH_USER_ID = "bench-user"
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+HISTORY_ENTRIES = 20
+
+# Any other status counts as an error (unknown meal names are part of the meal-details mix)
+EXPECTED_STATUSES = {"meal-details": {200, 404}}
+
+PROFILES = [
+    {"name": "A", "gender": "male", "age": 30, "height": 175, "weight": 70,
+     "healthGoal": "maintenance", "foodPreferences": "", "allergies": ""},
+    {"name": "B", "gender": "female", "age": 42, "height": 162, "weight": 68,
+     "healthGoal": "weight_loss", "foodPreferences": "vegetarian", "allergies": "nuts, milk"},
+    {"name": "C", "gender": "male", "age": 24, "height": 183, "weight": 80,
+     "healthGoal": "muscle_gain", "foodPreferences": "", "allergies": "egg"},
+]
+
+
+def percentile_ms(latencies, q):
+    return round(float(np.percentile(latencies, q)) * 1000, 3) if latencies else None
+
+
+def memory_mb():
+    """Current and peak resident set size of this process (the worker being measured)."""
+    current = None
+    try:
+        with open("/proc/self/statm") as f:
+            current = round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20, 1)
+    except (OSError, ValueError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = round(peak / 2**20 if sys.platform == "darwin" else peak / 1024, 1)
+    except ImportError:  # Windows
+        peak = None
+    return {"rss_mb": current, "peak_rss_mb": peak}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_app(mongo_uri):
+    """Import app.py with MongoDB swapped for mongomock or a local throwaway database."""
+    import pymongo
+
+    if mongo_uri:
+        real_client = pymongo.MongoClient
+
+        def client_factory(*args, **kwargs):
+            return real_client(mongo_uri, serverSelectionTimeoutMS=3000)
+    else:
+        import mongomock
+
+        def client_factory(*args, **kwargs):
+            return mongomock.MongoClient()
+
+    # app.py connects in the background at import; point it at the stand-in instead of Atlas
+    original = pymongo.MongoClient
+    pymongo.MongoClient = client_factory
+    try:
+        import app as api
+        api.wait_for_mongodb()
+    finally:
+        pymongo.MongoClient = original
+
+    from database.mongo_indexes import ensure_indexes
+
+    client = client_factory()
+    client.drop_database(DB_NAME)
+    api.client = client
+    api.db = client[DB_NAME]
+    api.collection = api.db["user_data"]
+    api.users_collection = api.db["users"]
+    api.rollups_collection = api.db[api.ROLLUPS_COLLECTION]
+    ensure_indexes(api.db)
+    return api
+
+
+def seed(api):
+    """A user with an account and some dashboard history."""
+    from api_core import build_user_document
+
+    documents = []
+    for i in range(HISTORY_ENTRIES):
+        document = build_user_document("Bench", "male", 30, 175, 80 - i * 0.5, "weight_loss", "", "",
+                                       2000, 150, 55, 225, "oats", "rice", "soup", user_id=BENCH_USER_ID)
+        document["created_at"] = datetime(2024, 1, 1 + i)
+        documents.append(document)
+    api.collection.insert_many(documents)
+    api.after_user_data_written(documents)
+
+
+def build_scenarios(api):
+    """name -> function(i) returning (method, path, json_body)."""
+    from api_core import format_meal_name
+
+    snapshot = api.model_registry.get_snapshot()
+    meal_names = [quote(format_meal_name(name)) for name in snapshot.foods[::97].tolist()[:50]]
+    meal_names.append(quote("no such meal"))
+
+    return {
+        "predict": lambda i: ("POST", "/api/predict", PROFILES[i % len(PROFILES)]),
+        "meal-details": lambda i: ("GET", f"/api/meal-details?meal={meal_names[i % len(meal_names)]}", None),
+        "dashboard": lambda i: ("GET", f"/api/dashboard?user_id={BENCH_USER_ID}", None),
+        "signin": lambda i: ("POST", "/api/auth/signin", {"email": BENCH_EMAIL, "password": BENCH_PASSWORD}),
+        "me": lambda i: ("GET", "/api/auth/me", None),
+        "signup": lambda i: ("POST", "/api/auth/signup",
+                             {"name": "Bench", "email": f"bench-{os.getpid()}-{i}-{time.time_ns()}@example.com",
+                              "password": BENCH_PASSWORD}),
+    }
+
+
+class TestClientDriver:
+    """Requests through Flask's test client (one thread, cookies kept per client)."""
+
+    def __init__(self, api):
+        self.api = api
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def session(self):
+        client = self.api.app.test_client()
+
+        def send(method, path, body):
+            response = client.open(path, method=method, json=body)
+            return response.status_code
+        return send
+
+
+class ServerDriver:
+    """Requests over HTTP to a threaded werkzeug WSGI server in this process."""
+
+    def __init__(self, api):
+        self.api = api
+        self.server = None
+
+    def start(self):
+        from werkzeug.serving import make_server
+
+        self.server = make_server("127.0.0.1", 0, self.api.app, threaded=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+    def session(self):
+        port = self.server.server_port
+        cookies = SimpleCookie()
+
+        def send(method, path, body):
+            headers = {}
+            if cookies:
+                headers["Cookie"] = "; ".join(f"{k}={m.value}" for k, m in cookies.items())
+            payload = None
+            if body is not None:
+                payload = json.dumps(body)
+                headers["Content-Type"] = "application/json"
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                for header in response.headers.get_all("Set-Cookie") or []:
+                    cookies.load(header)
+                return response.status
+            finally:
+                connection.close()
+        return send
+
+
+def run_scenario(driver, scenario, requests, concurrency, warmup, expected=(200,)):
+    """Send ``requests`` requests from ``concurrency`` sessions; returns per-request latencies.
+
+    Responses with a status outside ``expected`` (e.g. a 429 from the auth
+    rate limiter) are counted as errors.
+    """
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+
+    def worker(w):
+        send = driver.session()
+        # Every session signs in first so /api/auth/me has a session cookie
+        send("POST", "/api/auth/signin", {"email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+        for i in range(w, warmup, concurrency):
+            send(*scenario(i))
+        for i in range(w, requests, concurrency):
+            method, path, body = scenario(i)
+            start = time.perf_counter()
+            status = send(method, path, body)
+            latencies[w].append(time.perf_counter() - start)
+            if status not in expected:
+                errors[w] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    merged = [latency for per_worker in latencies for latency in per_worker]
+    return {
+        "requests": len(merged),
+        "errors": sum(errors),
+        "throughput_rps": round(len(merged) / elapsed, 1) if elapsed else None,
+        "mean_ms": round(float(np.mean(merged)) * 1000, 3) if merged else None,
+        "p50_ms": percentile_ms(merged, 50),
+        "p95_ms": percentile_ms(merged, 95),
+        "p99_ms": percentile_ms(merged, 99),
+    }
+
+
+def previous_result(mode):
+    paths = sorted(glob.glob(os.path.join(RESULTS_DIR, f"api-{mode}-*.json")))
+    if not paths:
+        return None, None
+    with open(paths[-1], encoding="utf-8") as f:
+        return paths[-1], json.load(f)
+
+
+def compare(result, baseline, threshold):
+    """Print p95 changes against ``baseline``; return the endpoints that regressed."""
+    regressions = []
+    print(f"\nCompared with {baseline['commit']} ({baseline['timestamp']}):")
+    for name, stats in result["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if not before or not before.get("p95_ms") or stats["p95_ms"] is None:
+            continue
+        change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        flag = ""
+        if change > threshold:
+            flag = "  <-- regression"
+            regressions.append(name)
+        print(f"  {name:<14} p95 {before['p95_ms']:>9.3f} -> {stats['p95_ms']:>9.3f} ms ({change:+.1f}%){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NutriDiet API")
+    parser.add_argument("--server", action="store_true", help="go through a real WSGI server instead of the test client")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per endpoint first")
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent client sessions (--server)")
+    parser.add_argument("--endpoints", default="predict,meal-details,dashboard,signin,me,signup",
+                        help="comma-separated subset of endpoints to run")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response caches")
+    parser.add_argument("--threshold", type=float, default=10.0, help="p95 slowdown (percent) reported as a regression")
+    parser.add_argument("--no-save", action="store_true", help="don't write the result to benchmarks/results/")
+    args = parser.parse_args()
+
+    mode = "server" if args.server else "client"
+    concurrency = args.concurrency if args.server else 1
+
+    # Settings app.py reads at import time. All requests come from one IP and one email, so the
+    # auth rate limiters are lifted; otherwise the auth timings would measure 429 responses.
+    os.environ.setdefault("WRITE_BEHIND_JOURNAL", os.path.join(tempfile.mkdtemp(), "pending_user_data.jsonl"))
+    os.environ["AUTH_IP_MAX_ATTEMPTS"] = "1000000000"
+    os.environ["AUTH_EMAIL_MAX_ATTEMPTS"] = "1000000000"
+    if args.no_cache:
+        os.environ["TARGETS_CACHE_SIZE"] = "0"
+        os.environ["DASHBOARD_CACHE_TTL"] = "0"
+        os.environ["MEAL_DETAILS_CACHE_SIZE"] = "0"
+
+    mongo_uri = os.getenv("MONGODB_TEST_URI")
+    np.random.seed(42)
+    api = load_app(mongo_uri)
+    seed(api)
+    scenarios = build_scenarios(api)
+    api.app.test_client().post("/api/auth/signup",
+                               json={"name": "Bench", "email": BENCH_EMAIL, "password": BENCH_PASSWORD})
+
+    driver = ServerDriver(api) if args.server else TestClientDriver(api)
+    driver.start()
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "mode": mode,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mongo": "local mongod" if mongo_uri else "mongomock",
+        "settings": {"requests": args.requests, "warmup": args.warmup, "concurrency": concurrency,
+                     "cache": not args.no_cache, "write_behind": api.WRITE_BEHIND_ENABLED},
+        "endpoints": {},
+    }
+    try:
+        print(f"{'endpoint':<14} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for name in args.endpoints.split(","):
+            stats = run_scenario(driver, scenarios[name], args.requests, concurrency, args.warmup,
+                                 EXPECTED_STATUSES.get(name, {200}))
+            result["endpoints"][name] = stats
+            print(f"{name:<14} {stats['throughput_rps']:>9} {stats['p50_ms']:>9} {stats['p95_ms']:>9} "
+                  f"{stats['p99_ms']:>9} {stats['errors']:>7}")
+    finally:
+        driver.stop()
+        api.write_queue.flush()
+        if mongo_uri:
+            api.client.drop_database(DB_NAME)
+
+    result["memory"] = memory_mb()
+    print(f"\nWorker memory: {result['memory']['rss_mb']} MB RSS, {result['memory']['peak_rss_mb']} MB peak")
+
+    failed = [name for name, stats in result["endpoints"].items() if stats["errors"]]
+    if failed:
+        print(f"\n[WARNING] Unexpected responses from: {', '.join(failed)} (timings include them)")
+
+    baseline_path, baseline = previous_result(mode)
+    regressions = compare(result, baseline, args.threshold) if baseline else []
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"api-{mode}-{datetime.now():%Y%m%d-%H%M%S}-{result['commit']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved {path}")
+
+    if regressions or failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
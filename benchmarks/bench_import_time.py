@@ -0,0 +1,155 @@
+# benchmarks/bench_import_time.py
+"""Import-time benchmark for app.py and main.py (``python -X importtime``).
+
+Imports each target in a fresh interpreter, several times, and reports the
+median wall time, the total import time and the slowest top-level imports.
+Heavy libraries that should stay deferred (pandas, scikit-learn, joblib)
+are listed when they show up. app.py is imported with ``WARM_UP_ENABLED=0``
+and an unreachable MONGODB_URI, so neither the background model warm-up nor
+a database round trip adds imports to the measurement (pymongo is still
+imported, by the MongoDB supervisor thread). ``--eager`` imports it with
+``EAGER_WARM_UP=1`` instead, to measure a start that waits for the warm-up.
+Run from the repository root:
+
+    python -m benchmarks.bench_import_time
+    python -m benchmarks.bench_import_time --repeat 10 --top 15
+    python -m benchmarks.bench_import_time --targets app --eager
+
+Each run is written to benchmarks/results/ and compared with the previous
+one; targets whose median got more than --threshold percent slower are
+flagged and the exit status is 1.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.bench_api import RESULTS_DIR, git_commit
+
+TARGETS = {
+    "app": "import app",
+    "main": "import main",
+}
+
+# Top-level packages that are expected to be imported lazily
+DEFERRED = ("pandas", "sklearn", "joblib", "scipy")
+
+NO_MONGODB_URI = "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=500&connectTimeoutMS=500"
+
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us, depth)} from ``-X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def measure(statement, repeat, eager=False):
+    env = dict(os.environ, MONGODB_URI=NO_MONGODB_URI, METRICS_ENABLED="1")
+    if eager:
+        env["EAGER_WARM_UP"] = "1"
+    else:
+        env["WARM_UP_ENABLED"] = "0"
+    wall = []
+    modules = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                                   env=env, capture_output=True, text=True)
+        wall.append(time.perf_counter() - start)
+        if completed.returncode != 0:
+            raise RuntimeError(f"{statement!r} failed:\n{completed.stderr[-2000:]}")
+        modules = parse_importtime(completed.stderr)
+    return wall, modules
+
+
+def previous_result(eager=False):
+    """Most recent saved result measured the same way (eager or not)."""
+    for path in sorted(glob.glob(os.path.join(RESULTS_DIR, "importtime-*.json")), reverse=True):
+        with open(path, encoding="utf-8") as f:
+            result = json.load(f)
+        if result.get("eager", False) == eager:
+            return result
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of app.py and main.py")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="comma-separated subset of targets")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to show")
+    parser.add_argument("--threshold", type=float, default=20.0, help="slowdown (percent) reported as a regression")
+    parser.add_argument("--no-save", action="store_true", help="don't write the result to benchmarks/results/")
+    parser.add_argument("--eager", action="store_true", help="import app.py with EAGER_WARM_UP=1 (waits for the warm-up)")
+    args = parser.parse_args()
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "eager": args.eager,
+        "targets": {},
+    }
+    for name in args.targets.split(","):
+        wall, modules = measure(TARGETS[name], args.repeat, args.eager)
+        top_level = sorted(((cumulative, module) for module, (_, cumulative, depth) in modules.items() if depth == 0),
+                           reverse=True)[:args.top]
+        deferred = sorted({module.split(".")[0] for module in modules} & set(DEFERRED))
+        stats = {
+            "median_wall_ms": round(statistics.median(wall) * 1000, 1),
+            "min_wall_ms": round(min(wall) * 1000, 1),
+            "import_ms": round(sum(self_us for self_us, _, _ in modules.values()) / 1000, 1),
+            "modules": len(modules),
+            "heavy_imported": deferred,
+            "slowest": [{"module": module, "cumulative_ms": round(cumulative / 1000, 1)} for cumulative, module in top_level],
+        }
+        result["targets"][name] = stats
+
+        print(f"\n{name}: {stats['median_wall_ms']} ms median wall ({stats['min_wall_ms']} ms min), "
+              f"{stats['import_ms']} ms importing {stats['modules']} modules")
+        for entry in stats["slowest"]:
+            print(f"  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+        if deferred:
+            print(f"  [WARNING] imported at startup: {', '.join(deferred)}")
+
+    regressions = []
+    baseline = previous_result(args.eager)
+    if baseline:
+        print(f"\nCompared with {baseline['commit']} ({baseline['timestamp']}):")
+        for name, stats in result["targets"].items():
+            before = baseline["targets"].get(name)
+            if not before:
+                continue
+            change = (stats["median_wall_ms"] - before["median_wall_ms"]) / before["median_wall_ms"] * 100
+            flag = ""
+            if change > args.threshold:
+                flag = "  <-- regression"
+                regressions.append(name)
+            print(f"  {name:<6} {before['median_wall_ms']:>8.1f} -> {stats['median_wall_ms']:>8.1f} ms ({change:+.1f}%){flag}")
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"importtime-{datetime.now():%Y%m%d-%H%M%S}-{result['commit']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved {path}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
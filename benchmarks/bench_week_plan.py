@@ -0,0 +1,53 @@
+# benchmarks/bench_week_plan.py
+"""Time weekly plan generation against catalog size.
+
+Larger catalogs are synthesized by resampling the real one with +/-10% noise
+on the nutrient values. Run from the repository root:
+
+    python -m benchmarks.bench_week_plan
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from meal_selection import MACRO_COLUMNS, build_macro_arrays, plan_week
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+REPEATS = 5
+
+# 30-year-old, 70 kg, 175 cm man on maintenance, as computed by calculate_nutrient_requirements
+DAILY_TARGETS = (1649, 123.7, 45.8, 185.5)
+
+
+def synthetic_catalog(base, size, rng):
+    rows = rng.randint(len(base), size=size)
+    values = base[MACRO_COLUMNS].to_numpy(dtype=np.float64)[rows]
+    values *= rng.uniform(0.9, 1.1, size=values.shape)
+    return pd.DataFrame(values, columns=MACRO_COLUMNS)
+
+
+def main():
+    rng = np.random.RandomState(42)
+    base = pd.read_csv("data/processed_diet.csv")
+
+    print(f"{'foods':>10} {'build (ms)':>12} {'plan (ms)':>12}")
+    for size in [len(base)] + SIZES:
+        catalog = base if size == len(base) else synthetic_catalog(base, size, rng)
+
+        start = time.perf_counter()
+        macros, macros_sq = build_macro_arrays(catalog)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        plan_week(macros, macros_sq, DAILY_TARGETS, rng=rng)  # warm up
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            plan = plan_week(macros, macros_sq, DAILY_TARGETS, rng=rng)
+        plan_ms = (time.perf_counter() - start) / REPEATS * 1000
+
+        assert plan is not None and len(plan) == 7
+        print(f"{size:>10} {build_ms:>12.2f} {plan_ms:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
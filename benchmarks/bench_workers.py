@@ -0,0 +1,201 @@
+# benchmarks/bench_workers.py
+"""Memory per gunicorn worker, with and without preloading the catalog and models.
+
+Starts ``gunicorn -c gunicorn.conf.py app:app`` with 1, 4 and 16 workers, once
+with ``GUNICORN_PRELOAD=1`` (loaded in the master, shared copy-on-write) and
+once with ``GUNICORN_PRELOAD=0`` (loaded by every worker), sends requests that
+touch the catalog, models and indexes, then reads each process's memory from
+/proc/<pid>/smaps_rollup (Linux only):
+
+    rss   resident pages, shared ones counted in full by every process
+    pss   shared pages divided between the processes sharing them
+    uss   pages private to the process
+
+Total PSS (master + workers) is what the deployment actually costs. MongoDB
+is not needed: unless MONGODB_TEST_URI is set the workers run without a
+database. Run from the repository root (``pip install gunicorn``):
+
+    python -m benchmarks.bench_workers
+    python -m benchmarks.bench_workers --workers 1,4,16 --requests 400
+
+Results are written to benchmarks/results/workers-<timestamp>-<commit>.json.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks.bench_api import PROFILES, RESULTS_DIR, git_commit
+
+# Nothing listens here, so workers give up on MongoDB quickly and serve without it
+NO_MONGODB_URI = "mongodb://127.0.0.1:1/?serverSelectionTimeoutMS=500&connectTimeoutMS=500"
+
+MEALS = ["apple", "rice", "oats", "chicken", "yogurt", "bread", "soup", "salad"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def wait_until_serving(port, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with status {process.returncode}")
+        try:
+            request(port, "GET", "/api/meal-details?meal=apple")
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not start serving within {timeout}s")
+
+
+def workload(i):
+    """Requests that touch the catalog, the meal index, the models and the neighbour index."""
+    meal = MEALS[i % len(MEALS)]
+    profile = PROFILES[i % len(PROFILES)]
+    return [
+        ("POST", "/api/predict", profile),
+        ("GET", f"/api/meal-details?meal={meal}", None),
+        ("GET", f"/api/meal-alternatives?meal={meal}&k=5", None),
+        ("POST", "/api/plan/week", dict(profile, days=7)),
+    ][i % 4]
+
+
+def children(pid):
+    """Worker pids of the gunicorn master ``pid``."""
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the fields after it don't
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def process_memory_mb(pid):
+    """rss/pss/uss of ``pid`` in MB from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss_mb": round(values.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(values.get("Pss", 0) / 1024, 1),
+        "uss_mb": round((values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)) / 1024, 1),
+    }
+
+
+def measure(workers, preload, requests, concurrency, startup_timeout):
+    port = free_port()
+    env = dict(os.environ,
+               WEB_CONCURRENCY=str(workers),
+               GUNICORN_PRELOAD="1" if preload else "0",
+               GUNICORN_BIND=f"127.0.0.1:{port}",
+               MONGODB_URI=os.getenv("MONGODB_TEST_URI", NO_MONGODB_URI),
+               WRITE_BEHIND_JOURNAL=os.path.join(tempfile.mkdtemp(), "pending_user_data.jsonl"))
+    process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_serving(port, process, startup_timeout)
+        # Enough concurrent requests that every worker serves some of them
+        with ThreadPoolExecutor(max(concurrency, workers)) as pool:
+            statuses = list(pool.map(lambda i: request(port, *workload(i)), range(requests)))
+        errors = sum(1 for status in statuses if status >= 500)
+
+        master = process_memory_mb(process.pid)
+        per_worker = [process_memory_mb(pid) for pid in children(process.pid)]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    def mean(key):
+        return round(sum(m[key] for m in per_worker) / len(per_worker), 1) if per_worker else None
+
+    return {
+        "workers": len(per_worker),
+        "preload": preload,
+        "requests": requests,
+        "errors": errors,
+        "master": master,
+        "worker_rss_mb": mean("rss_mb"),
+        "worker_pss_mb": mean("pss_mb"),
+        "worker_uss_mb": mean("uss_mb"),
+        "total_pss_mb": round(master["pss_mb"] + sum(m["pss_mb"] for m in per_worker), 1),
+        "per_worker": per_worker,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory per gunicorn worker")
+    parser.add_argument("--workers", default="1,4,16", help="comma-separated worker counts")
+    parser.add_argument("--requests", type=int, default=400, help="requests sent before measuring")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent client connections")
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="seconds to wait for gunicorn")
+    parser.add_argument("--no-save", action="store_true", help="don't write the result to benchmarks/results/")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        sys.exit("This benchmark reads /proc/<pid>/smaps_rollup and only runs on Linux")
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": [],
+    }
+    print(f"{'workers':>7} {'preload':>8} {'RSS/worker':>11} {'PSS/worker':>11} {'USS/worker':>11} "
+          f"{'total PSS':>10} {'errors':>7}")
+    for workers in [int(n) for n in args.workers.split(",")]:
+        for preload in (True, False):
+            run = measure(workers, preload, args.requests, args.concurrency, args.startup_timeout)
+            result["runs"].append(run)
+            print(f"{run['workers']:>7} {'yes' if preload else 'no':>8} {run['worker_rss_mb']:>8} MB "
+                  f"{run['worker_pss_mb']:>8} MB {run['worker_uss_mb']:>8} MB {run['total_pss_mb']:>7} MB "
+                  f"{run['errors']:>7}")
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"workers-{datetime.now():%Y%m%d-%H%M%S}-{result['commit']}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# dashboard_aggregation.py
+"""Weekly time series for the dashboard charts.
+
+A user's entries are bucketed by the week of ``created_at`` (weeks start on
+Monday) and averaged per week, so the dashboard costs one round trip and a
+fixed-size result however many entries the user has saved.  The grouping runs
+server-side as an aggregation pipeline (``$dateTrunc``, MongoDB 5.0+); on
+servers or mocks without it the same buckets are computed with one NumPy pass
+over the projected entries.
+"""
+from datetime import datetime
+
+import numpy as np
+
+import metrics
+
+DASHBOARD_HISTORY_WEEKS = 8
+
+# Fields needed to compute the weekly buckets client-side (fallback path)
+HISTORY_FIELDS = {"_id": 0, "weight": 1, "height": 1, "calories": 1, "created_at": 1}
+
+
+def weekly_history_pipeline(user_id, weeks=DASHBOARD_HISTORY_WEEKS):
+    """Aggregation pipeline returning the last ``weeks`` weekly buckets, oldest first."""
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$created_at", "unit": "week", "startOfWeek": "monday"}},
+            "weight": {"$avg": "$weight"},
+            "bmi": {"$avg": {"$divide": ["$weight", {"$pow": [{"$divide": ["$height", 100]}, 2]}]}},
+            "calories": {"$avg": "$calories"},
+            "entries": {"$sum": 1},
+        }},
+        {"$sort": {"_id": -1}},
+        {"$limit": weeks},
+        {"$sort": {"_id": 1}},
+        {"$project": {"_id": 0, "week": "$_id", "weight": 1, "bmi": 1, "calories": 1, "entries": 1}},
+    ]
+
+
+def weekly_buckets(entries, weeks=DASHBOARD_HISTORY_WEEKS):
+    """Same buckets as ``weekly_history_pipeline``, computed from projected entries with NumPy."""
+    entries = [e for e in entries if e.get("created_at") is not None]
+    if not entries:
+        return []
+
+    days = np.array([e["created_at"] for e in entries], dtype="datetime64[D]").astype(np.int64)
+    weight = np.array([e["weight"] for e in entries], dtype=float)
+    height_m = np.array([e["height"] for e in entries], dtype=float) / 100
+    calories = np.array([e.get("calories", np.nan) for e in entries], dtype=float)
+
+    # 1970-01-01 was a Thursday: shift so buckets start on Monday
+    week_start = days - (days + 3) % 7
+    starts, bucket = np.unique(week_start, return_inverse=True)
+    counts = np.bincount(bucket)
+    has_calories = ~np.isnan(calories)
+    calorie_counts = np.bincount(bucket, weights=has_calories)
+    mean_weight = np.bincount(bucket, weights=weight) / counts
+    mean_bmi = np.bincount(bucket, weights=weight / (height_m * height_m)) / counts
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_calories = np.bincount(bucket, weights=np.where(has_calories, calories, 0)) / calorie_counts
+
+    buckets = []
+    for i in range(max(0, len(starts) - weeks), len(starts)):
+        buckets.append({
+            "week": datetime.combine(np.datetime64(int(starts[i]), "D").item(), datetime.min.time()),
+            "weight": float(mean_weight[i]),
+            "bmi": float(mean_bmi[i]),
+            "calories": None if np.isnan(mean_calories[i]) else float(mean_calories[i]),
+            "entries": int(counts[i]),
+        })
+    return buckets
+
+
+# ✅ Weekly buckets for a user (pymongo collection)
+def fetch_weekly_history(collection, user_id, weeks=DASHBOARD_HISTORY_WEEKS):
+    from pymongo.errors import OperationFailure
+
+    try:
+        with metrics.mongo('aggregate', 'user_data'):
+            return list(collection.aggregate(weekly_history_pipeline(user_id, weeks)))
+    except (OperationFailure, NotImplementedError):
+        with metrics.mongo('find', 'user_data'):
+            entries = list(collection.find({"user_id": user_id}, HISTORY_FIELDS))
+        with metrics.stage('history_buckets'):
+            return weekly_buckets(entries, weeks)
+
+
+# ✅ Weekly buckets for a user (motor collection, ASGI mode)
+async def fetch_weekly_history_async(collection, user_id, weeks=DASHBOARD_HISTORY_WEEKS):
+    from pymongo.errors import OperationFailure
+
+    try:
+        with metrics.mongo('aggregate', 'user_data'):
+            return await collection.aggregate(weekly_history_pipeline(user_id, weeks)).to_list(None)
+    except (OperationFailure, NotImplementedError):
+        with metrics.mongo('find', 'user_data'):
+            entries = await collection.find({"user_id": user_id}, HISTORY_FIELDS).to_list(None)
+        with metrics.stage('history_buckets'):
+            return weekly_buckets(entries, weeks)
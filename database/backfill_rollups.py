@@ -0,0 +1,36 @@
+# database/backfill_rollups.py
+"""Rebuild the per-user rollup documents (user_rollups) from user_data.
+
+Run once after deploying rollups, or whenever a rollup looks stale:
+
+    python -m database.backfill_rollups              # every user
+    python -m database.backfill_rollups USER_ID ...  # selected users
+
+Entries written while a user's rollup is being rebuilt may be counted twice;
+run it when that user is not saving new entries.
+"""
+import sys
+
+from pymongo import MongoClient
+
+from database.connection import MONGODB_DB_NAME, MONGODB_URI
+from user_rollups import ROLLUPS_COLLECTION, rebuild_rollup
+
+
+def main(user_ids):
+    client = MongoClient(MONGODB_URI)
+    db = client[MONGODB_DB_NAME]
+    collection = db["user_data"]
+    rollups = db[ROLLUPS_COLLECTION]
+
+    user_ids = user_ids or [user_id for user_id in collection.distinct("user_id") if user_id]
+    for i, user_id in enumerate(user_ids, 1):
+        rebuild_rollup(collection, rollups, user_id)
+        if i % 100 == 0:
+            print(f"[OK] Rebuilt {i}/{len(user_ids)} rollups")
+    print(f"[OK] Rebuilt rollups for {len(user_ids)} users")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
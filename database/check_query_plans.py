@@ -0,0 +1,68 @@
+# database/check_query_plans.py
+"""Check that the dashboard and sign-in queries use indexes instead of collection scans.
+
+Runs against a local mongod (a throwaway database is created and dropped):
+
+    MONGODB_TEST_URI=mongodb://localhost:27017 python -m database.check_query_plans
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+
+from dashboard_aggregation import HISTORY_FIELDS, weekly_history_pipeline
+from database.mongo_indexes import ensure_indexes
+
+DB_NAME = "NutriDiet_query_plan_check"
+
+
+def winning_stages(plan):
+    """Flatten the stage names of the winning plan."""
+    if "queryPlanner" not in plan:
+        # Aggregation explain: the query plan sits under the first ($cursor) stage
+        plan = plan["stages"][0]["$cursor"]
+    stages = []
+    stage = plan["queryPlanner"]["winningPlan"]
+    while stage:
+        stages.append(stage.get("stage"))
+        stage = stage.get("inputStage") or stage.get("queryPlan")
+    return stages
+
+
+def main():
+    client = MongoClient(os.getenv("MONGODB_TEST_URI", "mongodb://localhost:27017"), serverSelectionTimeoutMS=3000)
+    client.drop_database(DB_NAME)
+    db = client[DB_NAME]
+    try:
+        ensure_indexes(db)
+        now = datetime.now()
+        db["user_data"].insert_many([
+            {"user_id": f"user{i % 50}", "weight": 70 + i % 10, "height": 170, "calories": 2000,
+             "created_at": now - timedelta(days=i)}
+            for i in range(2000)
+        ])
+        db["users"].insert_many([{"name": f"user{i}", "email": f"user{i}@example.com"} for i in range(500)])
+
+        # name -> (explain output, whether an in-memory SORT is expected)
+        queries = {
+            "latest entry": (db["user_data"].find({"user_id": "user7"}).sort("created_at", -1).limit(1).explain(), False),
+            "dashboard weekly history": (db.command("aggregate", "user_data", pipeline=weekly_history_pipeline("user7"),
+                                                   explain=True), True),
+            "dashboard history (fallback)": (db["user_data"].find({"user_id": "user7"}, HISTORY_FIELDS).explain(), False),
+            "sign-in lookup": (db["users"].find({"email": "user7@example.com"}).limit(1).explain(), False),
+        }
+
+        failed = False
+        for name, (plan, sorts) in queries.items():
+            stages = winning_stages(plan)
+            ok = "IXSCAN" in stages and "COLLSCAN" not in stages and (sorts or "SORT" not in stages)
+            failed = failed or not ok
+            print(f"[{'OK' if ok else 'FAIL'}] {name}: {' <- '.join(s for s in stages if s)}")
+        return 1 if failed else 0
+    finally:
+        client.drop_database(DB_NAME)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,29 @@
+# database/mongo_indexes.py
+"""MongoDB indexes used by the API, created at startup (create_index is idempotent)."""
+from pymongo import ASCENDING, DESCENDING
+
+# Latest entry: find({"user_id": ...}).sort("created_at", -1); weekly history: aggregate([{"$match": {"user_id": ...}}, ...])
+USER_DATA_INDEXES = [
+    ([("user_id", ASCENDING), ("created_at", DESCENDING)], {"name": "user_id_created_at"}),
+]
+
+# Signup/signin lookups: find_one({"email": ...}); unique so concurrent signups can't duplicate an account
+USERS_INDEXES = [
+    ([("email", ASCENDING)], {"name": "email_unique", "unique": True}),
+]
+
+
+def ensure_indexes(db):
+    """Create the indexes the API queries rely on."""
+    for keys, options in USER_DATA_INDEXES:
+        db['user_data'].create_index(keys, **options)
+    for keys, options in USERS_INDEXES:
+        db['users'].create_index(keys, **options)
+
+
+async def ensure_indexes_async(db):
+    """``ensure_indexes`` for a motor database (ASGI mode)."""
+    for keys, options in USER_DATA_INDEXES:
+        await db['user_data'].create_index(keys, **options)
+    for keys, options in USERS_INDEXES:
+        await db['users'].create_index(keys, **options)
@@ -0,0 +1,54 @@
+# gunicorn.conf.py
+"""Gunicorn settings for serving app.py with several worker processes.
+
+    pip install gunicorn
+    gunicorn -c gunicorn.conf.py app:app
+
+With ``preload_app`` (the default here) app.py is imported once in the master:
+the master finishes the warm-up (which app.py otherwise runs in the
+background) before the workers are forked, so the catalog, model bundle and
+indexes are shared with them copy-on-write instead of being loaded again by
+every worker (see the layout notes in model_registry.py).  Before the first
+fork the master freezes the garbage collector's view of everything loaded so
+far, so the workers' collections don't write to (and copy) those pages, and
+stops its background threads and closes its MongoDB client; each worker
+starts its own MongoDB supervisor (and, if the master could not warm up, its
+own warm-up retries).
+
+A worker that sees the catalog or model files change reloads them on its own,
+and that copy is no longer shared; restart gunicorn after retraining to share
+the new version again (with preload_app a HUP does not reload the app).
+
+Environment: GUNICORN_BIND (0.0.0.0:5000), WEB_CONCURRENCY (4 workers),
+GUNICORN_PRELOAD (1; 0 loads everything in each worker).
+"""
+import gc
+import os
+import sys
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', '4'))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+
+
+def when_ready(server):
+    # Runs in the master after the preload, before any worker is forked
+    if not preload_app:
+        return
+    api = sys.modules.get('app')
+    if api is not None:
+        api.stop_background_tasks()
+        if not api.warm_up_task.warm:
+            api.warm_up_task.run_once()
+    gc.collect()
+    gc.freeze()
+    server.log.info("Preloaded catalog and models; %d objects frozen for copy-on-write sharing",
+                    gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    api = sys.modules.get('app')
+    if api is not None:
+        api.start_background_tasks()
@@ -1,14 +1,27 @@
-import os
 import sys
 
+# The scripts are imported when their menu entry is first chosen and then run in this process,
+# so pandas/scikit-learn are loaded once per session instead of once per action.
+
 def run_preprocessing():
-    os.system("python scripts/preprocess_data.py")
+    from scripts.preprocess_data import preprocess_data
+    preprocess_data()
 
 def run_training():
-    os.system("python scripts/train_model.py")
+    from scripts.train_model import train_models
+    train_models()
 
 def run_prediction():
-    os.system("python scripts/predict_diet.py")
+    from scripts.predict_diet import recommend_meals
+    recommend_meals()
+
+def run_action(action):
+    try:
+        action()
+    except KeyboardInterrupt:
+        print("\n⚠️ Cancelled.")
+    except Exception as e:
+        print(f"❌ Error: {e}")
 
 def main():
     while True:
@@ -24,11 +37,11 @@ def main():
         choice = input("Enter your choice (1-4): ").strip()
 
         if choice == "1":
-            run_preprocessing()
+            run_action(run_preprocessing)
         elif choice == "2":
-            run_training()
+            run_action(run_training)
         elif choice == "3":
-            run_prediction()
+            run_action(run_prediction)
         elif choice == "4":
             print("👋 Exiting... Stay healthy and eat smart!")
             sys.exit(0)
@@ -0,0 +1,98 @@
+# meal_index.py
+"""Name lookup index over the food catalog for /api/meal-details.
+
+An exact-name lookup answers most queries; a trigram index narrows
+substring searches to a few candidate rows instead of scanning the catalog.
+
+Everything is held in a few flat NumPy arrays (sorted keys searched with
+``searchsorted``, postings in CSR form) rather than per-name dicts and
+lists, so an index built before a fork stays shared with the workers.
+"""
+import numpy as np
+
+
+def normalize_meal_name(name):
+    """Lowercase and collapse whitespace, as the frontend formats names differently."""
+    return ' '.join(str(name).lower().split())
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _lookup(keys, key):
+    """Position of ``key`` in the sorted array ``keys``, or None."""
+    i = int(np.searchsorted(keys, key))
+    if i < len(keys) and keys[i] == key:
+        return i
+    return None
+
+
+def build_meal_index(foods):
+    """Build the lookup index; row ids are positions in the catalog (missing names are '')."""
+    names = np.array([food.lower() if isinstance(food, str) else '' for food in foods], dtype=str)
+
+    # First row for every stripped name (np.unique keeps the first occurrence)
+    stripped = np.char.strip(names)
+    exact_keys, exact_rows = np.unique(stripped, return_index=True)
+    keep = exact_keys != ''
+    exact_keys, exact_rows = exact_keys[keep], exact_rows[keep].astype(np.int32)
+
+    postings = {}
+    for food_id, name in enumerate(names.tolist()):
+        for gram in _trigrams(name):
+            postings.setdefault(gram, []).append(food_id)
+    grams = sorted(postings)
+    offsets = np.zeros(len(grams) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(postings[gram]) for gram in grams])
+    ids = np.fromiter((food_id for gram in grams for food_id in postings[gram]), dtype=np.int32, count=offsets[-1])
+
+    return {
+        'names': names,
+        'exact_keys': exact_keys,
+        'exact_rows': exact_rows,
+        'trigram_keys': np.array(grams, dtype='<U3'),
+        'trigram_offsets': offsets,
+        'trigram_ids': ids,
+    }
+
+
+def _postings(index, gram):
+    i = _lookup(index['trigram_keys'], gram)
+    if i is None:
+        return None
+    return index['trigram_ids'][index['trigram_offsets'][i]:index['trigram_offsets'][i + 1]]
+
+
+def find_meal(index, meal_name):
+    """Return the catalog row of the best match for ``meal_name``, or None.
+
+    Exact (case-insensitive) matches win; otherwise the first row whose name
+    contains the query as a literal substring.
+    """
+    query = normalize_meal_name(meal_name)
+    i = _lookup(index['exact_keys'], query)
+    if i is not None:
+        return int(index['exact_rows'][i])
+
+    names = index['names']
+    if len(query) < 3:
+        candidates = np.arange(len(names))
+    else:
+        postings = []
+        for gram in _trigrams(query):
+            ids = _postings(index, gram)
+            if ids is None:
+                return None
+            postings.append(ids)
+        postings.sort(key=len)
+        candidates = postings[0]
+        for ids in postings[1:]:
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+            if len(candidates) == 0:
+                return None
+
+    matches = np.flatnonzero(np.char.find(names[candidates], query) >= 0)
+    if len(matches) == 0:
+        return None
+    return int(candidates[matches[0]])
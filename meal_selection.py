@@ -0,0 +1,156 @@
+# meal_selection.py
+"""Nutrient-target-aware meal selection.
+
+Each meal gets a share of the daily calorie/protein/fat/carb targets. For
+every food the best portion size (in multiples of 100 g) is solved in closed
+form as a weighted least-squares fit against that share, so scoring the whole
+catalog is two matrix-vector products over precomputed arrays. The top-k
+foods are found with ``argpartition`` and one of them is picked at random to
+keep recommendations varied.
+"""
+import numpy as np
+
+MACRO_COLUMNS = [
+    "Calories (kcal per 100g)",
+    "Protein (g per 100g)",
+    "Fat (g per 100g)",
+    "Carbohydrates (g per 100g)"
+]
+
+# Share of the daily targets per meal
+MEAL_SHARES = {
+    "breakfast": 0.25,
+    "lunch": 0.40,
+    "dinner": 0.35,
+}
+
+# Allowed portion range, in multiples of 100 g
+MIN_PORTION = 0.5
+MAX_PORTION = 5.0
+
+TOP_K = 10
+
+
+def build_macro_arrays(catalog):
+    """Per-100g macro matrix (n_foods x 4) and its elementwise square, read-only."""
+    macros = np.ascontiguousarray(catalog[MACRO_COLUMNS].to_numpy(dtype=np.float64))
+    macros_sq = macros * macros
+    macros.flags.writeable = False
+    macros_sq.flags.writeable = False
+    return macros, macros_sq
+
+
+def score_foods(macros, macros_sq, target):
+    """Best portion and relative squared error against ``target`` for every food.
+
+    Errors are measured relative to each target value, so calories and grams
+    of fat weigh the same. Foods that can't be scored get an infinite error.
+    """
+    portions, errors = score_meals(macros, macros_sq, np.asarray(target, dtype=np.float64)[np.newaxis, :])
+    return portions[:, 0], errors[:, 0]
+
+
+def score_meals(macros, macros_sq, meal_targets):
+    """``score_foods`` for several targets at once: (n_foods x n_targets) portions and errors."""
+    weights = 1.0 / np.maximum(meal_targets, 1e-6)
+    num = macros @ weights.T
+    den = macros_sq @ (weights * weights).T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        portions = np.clip(num / den, MIN_PORTION, MAX_PORTION)
+    # sum_j (p * m_j * w_j - 1)^2 expanded, so no (n_foods x 4) temporary is needed
+    errors = portions * portions * den - 2 * portions * num + meal_targets.shape[1]
+    errors[~np.isfinite(errors)] = np.inf
+    return portions, errors
+
+
+def select_meals(macros, macros_sq, daily_targets, allowed=None, top_k=TOP_K, rng=np.random):
+    """Choose a different food and portion for each meal.
+
+    ``daily_targets`` is (calories, protein, fat, carbs) for the whole day and
+    ``allowed`` an optional boolean mask over catalog rows. Returns
+    ``{meal: (row, portion_grams)}``, or None if no food is available.
+    """
+    daily = np.asarray(daily_targets, dtype=np.float64)
+    chosen = {}
+    for meal, share in MEAL_SHARES.items():
+        portions, errors = score_foods(macros, macros_sq, daily * share)
+        if allowed is not None:
+            errors[~allowed] = np.inf
+        for row, _ in chosen.values():
+            errors[row] = np.inf
+
+        k = min(top_k, int(np.isfinite(errors).sum()))
+        if k == 0:
+            return None
+        candidates = np.argpartition(errors, k - 1)[:k] if k < len(errors) else np.argsort(errors)[:k]
+        row = int(candidates[rng.randint(k)])
+        chosen[meal] = (row, float(portions[row] * 100))
+    return chosen
+
+
+def plan_week(macros, macros_sq, daily_targets, days=7, allowed=None, no_repeat_days=7,
+              top_k=3, rng=np.random):
+    """Plan ``days`` days of breakfast/lunch/dinner.
+
+    All foods are scored against every meal's share of the targets in one
+    pass; each meal then keeps a small candidate pool (``argpartition``) that a
+    greedy day-by-day pass draws from. No food repeats within
+    ``no_repeat_days`` days (unless the pool runs out), and the last meal of
+    each day is fitted to whatever is left of that day's targets.
+
+    Returns a list of ``{meal: (row, portion_grams)}`` per day, or None if no
+    food is available.
+    """
+    daily = np.asarray(daily_targets, dtype=np.float64)
+    meals = list(MEAL_SHARES)
+    meal_targets = np.outer([MEAL_SHARES[meal] for meal in meals], daily)
+
+    portions, errors = score_meals(macros, macros_sq, meal_targets)
+    if allowed is not None:
+        errors[~allowed] = np.inf
+
+    n_available = int(np.isfinite(errors[:, 0]).sum())
+    if n_available == 0:
+        return None
+    pool_size = min(n_available, no_repeat_days * len(meals) + top_k)
+    pools = []
+    for m in range(len(meals)):
+        pool = np.argpartition(errors[:, m], pool_size - 1)[:pool_size] if pool_size < len(errors) else np.arange(len(errors))
+        pool = pool[np.argsort(errors[pool, m])]
+        pools.append(pool[np.isfinite(errors[pool, m])])
+
+    last_used = {}
+    plan = []
+    for day in range(days):
+        remaining = daily.copy()
+        day_plan = {}
+        for m, meal in enumerate(meals):
+            pool = pools[m]
+            used_today = [row for row, _ in day_plan.values()]
+            fresh = np.array([last_used.get(int(row), -no_repeat_days) <= day - no_repeat_days
+                              and row not in used_today for row in pool], dtype=bool)
+            candidates = pool[fresh]
+            if len(candidates) == 0:
+                # Not enough distinct foods: fall back to the least recently used ones
+                candidates = pool[[row not in used_today for row in pool]]
+                if len(candidates) == 0:
+                    candidates = pool
+                order = np.argsort([last_used.get(int(row), -no_repeat_days) for row in candidates], kind='stable')
+                candidates = candidates[order]
+
+            if m == len(meals) - 1:
+                # Last meal of the day closes the gap to the daily targets
+                target = np.maximum(remaining, meal_targets[m] * 0.1)
+                fit_portions, fit_errors = score_foods(macros[candidates], macros_sq[candidates], target)
+                best = np.argsort(fit_errors)[:top_k]
+                pick = best[rng.randint(len(best))]
+                row, portion = int(candidates[pick]), float(fit_portions[pick])
+            else:
+                row = int(candidates[rng.randint(min(top_k, len(candidates)))])
+                portion = float(portions[row, m])
+
+            day_plan[meal] = (row, portion * 100)
+            remaining = remaining - macros[row] * portion
+            last_used[row] = day
+        plan.append(day_plan)
+    return plan
@@ -0,0 +1,197 @@
+# metrics.py
+"""Prometheus-style metrics for the Flask API, without extra dependencies.
+
+Per-route request latency, in-flight requests, per-stage timings inside the
+handlers (``with metrics.stage("meal_selection"):``) and MongoDB operation
+timings (``with metrics.mongo("find_one", "user_data"):``) are recorded in
+fixed-bucket histograms and served in the text exposition format by
+``render()``.  Values that other components already count (cache hits, the
+write-behind queue) are pulled in at scrape time by collectors.
+
+With ``METRICS_ENABLED=0`` nothing is recorded: ``stage`` and ``mongo``
+return a shared no-op context manager and no request hooks are installed.
+Metrics are per worker process.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+from flask import g, request
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') != '0'
+
+# Upper bounds (seconds) shared by all latency histograms
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NOOP = nullcontext()
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Latency histogram with one series per label combination."""
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total!r}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class Gauge:
+    """Value that goes up and down (e.g. requests in flight)."""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def render(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} gauge', f'{self.name} {self.value}']
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+request_seconds = Histogram('nutridiet_request_duration_seconds', 'HTTP request latency by route.',
+                            ('method', 'route', 'status'))
+stage_seconds = Histogram('nutridiet_stage_duration_seconds', 'Time spent in internal stages of a request.',
+                          ('stage',))
+mongo_seconds = Histogram('nutridiet_mongo_operation_duration_seconds', 'MongoDB operation latency.',
+                          ('operation', 'collection'))
+in_flight = Gauge('nutridiet_requests_in_flight', 'Requests currently being handled by this worker.')
+
+_collectors = []
+
+
+def stage(name):
+    """Time a block of work under ``name``."""
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _Timer(stage_seconds, (name,))
+
+
+def mongo(operation, collection):
+    """Time a MongoDB call, e.g. ``mongo("find_one", "users")``."""
+    if not METRICS_ENABLED:
+        return _NOOP
+    return _Timer(mongo_seconds, (operation, collection))
+
+
+def add_collector(collect):
+    """Register ``collect()`` -> iterable of (name, type, help, {labels}, value), called at scrape time."""
+    _collectors.append(collect)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in (request_seconds, stage_seconds, mongo_seconds, in_flight):
+        lines.extend(metric.render())
+
+    seen = set()
+    for collect in _collectors:
+        try:
+            samples = list(collect())
+        except Exception as e:
+            print(f"[WARNING] Metrics collector failed: {e}")
+            continue
+        for name, metric_type, help_text, labels, value in samples:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+            lines.append(f'{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _before_request():
+    in_flight.inc()
+    g._metrics_in_flight = True
+    g._metrics_start = time.perf_counter()
+
+
+def _after_request(response):
+    start = g.pop('_metrics_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        request_seconds.observe(time.perf_counter() - start, request.method, route, str(response.status_code))
+    return response
+
+
+def _teardown_request(exc):
+    if g.pop('_metrics_in_flight', False):
+        in_flight.dec()
+
+
+def init_app(app):
+    """Install the request hooks and the ``/metrics`` route (only when enabled)."""
+    if not METRICS_ENABLED:
+        return
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        return app.response_class(render(), mimetype='text/plain; version=0.0.4')
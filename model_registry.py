@@ -0,0 +1,373 @@
+# model_registry.py
+"""Process-wide registry for the food catalog and the meal clustering models.
+
+Every worker loads ``data/processed_diet.csv`` and the active model bundle
+(scaler, three KMeans models, cluster and neighbour indexes; see
+``scripts/train_model.py``) once, at startup or on first use, and shares them
+between all routes.  The registry watches the files' modification times --
+including ``models/CURRENT`` -- and swaps in a freshly loaded snapshot when any
+of them change, so retraining or activating another bundle version does not
+require a restart.  One thread loads the new snapshot while the others keep
+serving the current one; files that fail to load are not tried again until
+they change.
+
+Routes must treat everything on a snapshot as read-only.
+
+A snapshot is laid out to be shared copy-on-write when it is loaded before
+forking (``gunicorn --preload``, see gunicorn.conf.py): the catalog keeps only
+numeric columns, food names are one fixed-width NumPy string array
+(``Snapshot.foods``) and the name indexes are flat arrays, so there are no
+per-row Python objects whose reference counts would dirty the shared pages.
+
+pandas, joblib and scikit-learn (through scripts.train_model and
+scripts.preprocess_data) are imported on the first load, not when this module
+is imported, so the API process starts without them.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+
+import metrics
+from cache import LRUCache
+from meal_index import build_meal_index
+from meal_selection import build_macro_arrays
+from veg_filter import NONVEG_TOKENS, VEG_TOKENS
+
+CATALOG_PATH = "data/processed_diet.csv"
+
+# Optional artifact: rebuilt in-process when missing or stale
+ALLERGEN_INDEX_PATH = "data/allergen_index.pkl"
+
+# Serialized /api/meal-details responses kept per snapshot
+MEAL_DETAILS_CACHE_SIZE = int(os.getenv('MEAL_DETAILS_CACHE_SIZE', '2048'))
+
+# Allergy term lookups kept per snapshot (outside the read-only allergen index)
+ALLERGEN_TERM_CACHE_SIZE = int(os.getenv('ALLERGEN_TERM_CACHE_SIZE', '1024'))
+
+# How often (seconds) to stat the files on disk for changes
+RELOAD_CHECK_INTERVAL = float(os.getenv('MODEL_RELOAD_CHECK_INTERVAL', '2'))
+
+
+class Snapshot:
+    """Immutable view of the catalog and models loaded at one point in time."""
+
+    def __init__(self, catalog, foods, bundle, cluster_index, allergen_index, neighbors_index, mtimes):
+        self.catalog = catalog
+        self.foods = foods
+        self.model_version = bundle["version"]
+        self.features = bundle["features"]
+        self.scaler = bundle["scaler"]
+        self.models = bundle["models"]
+        self.cluster_index = cluster_index
+        self.allergen_index = allergen_index
+        self.neighbors_index = neighbors_index
+        self.nonveg = _nonveg_mask(allergen_index, len(catalog))
+        self.meal_index = build_meal_index(foods)
+        self.macros, self.macros_sq = build_macro_arrays(catalog)
+        self.meal_details_cache = LRUCache(MEAL_DETAILS_CACHE_SIZE)
+        self.allergen_term_cache = LRUCache(ALLERGEN_TERM_CACHE_SIZE)
+        self.mtimes = mtimes
+        self.loaded_at = time.time()
+
+
+_lock = threading.Lock()
+_snapshot = None
+_last_check = 0.0
+_inline_reload = True
+# mtimes of files that failed to load (and the error), so they aren't reloaded on every check
+_failed_mtimes = None
+_failed_error = None
+
+
+def _watched_paths():
+    return [CATALOG_PATH]
+
+
+def _optional_paths():
+    from scripts.preprocess_data import COLUMNAR_CATALOG_DIR
+    from scripts.train_model import BUNDLES_DIR, CURRENT_BUNDLE_PATH, LEGACY_MODEL_PATHS, active_bundle_version
+
+    paths = [CURRENT_BUNDLE_PATH, ALLERGEN_INDEX_PATH, os.path.join(COLUMNAR_CATALOG_DIR, "manifest.json")]
+    version = active_bundle_version()
+    if version is None:
+        paths += list(LEGACY_MODEL_PATHS.values())
+    else:
+        paths.append(os.path.join(BUNDLES_DIR, version, "manifest.json"))
+    return paths
+
+
+def _current_mtimes():
+    mtimes = {path: os.stat(path).st_mtime_ns for path in _watched_paths()}
+    for path in _optional_paths():
+        mtimes[path] = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+    return mtimes
+
+
+def _freeze(array):
+    array.flags.writeable = False
+    return array
+
+
+def _string_array(values):
+    """Fixed-width string array (missing values become '')."""
+    return _freeze(np.array([value if isinstance(value, str) else '' for value in values], dtype=str))
+
+
+def _split_string_columns(catalog):
+    """Remove the string columns from ``catalog`` in place (numeric blocks, e.g. the mmap, are kept)."""
+    foods = _string_array(catalog['food'])
+    for column in [column for column in catalog.columns if catalog[column].dtype == object]:
+        del catalog[column]
+    return catalog, foods
+
+
+def _load_bundle(catalog):
+    """Load the active model bundle, or wrap the legacy loose pickles in the same shape."""
+    import joblib
+    from scripts.train_model import FEATURES, LEGACY_MODEL_PATHS, load_model_bundle, validate_bundle_features
+
+    bundle = load_model_bundle()
+    if bundle is None:
+        print("[WARNING] No active model bundle, loading legacy model files")
+        return {
+            "version": "legacy",
+            "features": FEATURES,
+            "scaler": None,
+            "models": {meal: joblib.load(path) for meal, path in LEGACY_MODEL_PATHS.items()},
+            "cluster_index": None,
+            "neighbors_index": None,
+        }
+    validate_bundle_features(bundle, catalog.columns)
+    return bundle
+
+
+def _cluster_index(catalog, bundle, fingerprint):
+    """The bundle's cluster index, rebuilt in memory if it doesn't match the catalog."""
+    from scripts.train_model import CLUSTER_INDEX_VERSION, build_cluster_index
+
+    index = bundle["cluster_index"]
+    if index is not None and (index.get("version") != CLUSTER_INDEX_VERSION
+                              or index.get("n_foods") != len(catalog)
+                              or index.get("fingerprint") != fingerprint):
+        print(f"[WARNING] Cluster index of model bundle {bundle['version']} does not match the catalog, rebuilding in memory")
+        index = None
+    if index is None:
+        index = build_cluster_index(catalog, bundle["models"], bundle["features"], bundle["scaler"])
+
+    for meal in index["labels"]:
+        _freeze(index["labels"][meal])
+        for members in index["members"][meal].values():
+            _freeze(members)
+    return index
+
+
+def _neighbors_index(catalog, bundle, fingerprint):
+    """The bundle's nearest-neighbour index, rebuilt in memory if it doesn't match the catalog."""
+    from scripts.train_model import NEIGHBORS_INDEX_VERSION, build_neighbors_index
+
+    index = bundle["neighbors_index"]
+    if index is not None and (index.get("version") == NEIGHBORS_INDEX_VERSION
+                              and index.get("n_foods") == len(catalog)
+                              and index.get("fingerprint") == fingerprint
+                              and index.get("features") == bundle["features"]):
+        return index
+    if index is not None:
+        print(f"[WARNING] Neighbour index of model bundle {bundle['version']} does not match the catalog, rebuilding in memory")
+    return build_neighbors_index(catalog, bundle["features"])
+
+
+def _load_allergen_index(catalog, fingerprint):
+    """Load the allergen index saved by preprocess_data.py, rebuilding it if it doesn't match."""
+    import joblib
+    from scripts.preprocess_data import ALLERGEN_INDEX_VERSION, build_allergen_index
+
+    if os.path.exists(ALLERGEN_INDEX_PATH):
+        index = joblib.load(ALLERGEN_INDEX_PATH)
+        if (index.get("version") == ALLERGEN_INDEX_VERSION
+                and index.get("n_foods") == len(catalog)
+                and index.get("fingerprint") == fingerprint):
+            return index
+        print("[WARNING] allergen_index.pkl does not match the catalog, rebuilding in memory")
+    return build_allergen_index(catalog["food"].tolist())
+
+
+def _nonveg_mask(allergen_index, n_foods):
+    """Rows veg_filter.is_nonveg would flag, looked up through the index's token postings."""
+    tokens = allergen_index["tokens"]
+
+    def food_ids(words):
+        postings = [tokens[word] for word in words if word in tokens]
+        return np.concatenate(postings) if postings else np.empty(0, dtype=np.int32)
+
+    mask = np.zeros(n_foods, dtype=bool)
+    mask[food_ids(NONVEG_TOKENS)] = True
+    mask[food_ids(VEG_TOKENS)] = False
+    return _freeze(mask)
+
+
+def _load_catalog():
+    """Prefer the memory-mapped columnar catalog (shared page cache across workers) over the CSV."""
+    import pandas as pd
+    from scripts.preprocess_data import load_columnar_catalog
+
+    catalog = load_columnar_catalog(CATALOG_PATH)
+    if catalog is None:
+        catalog = pd.read_csv(CATALOG_PATH)
+    return catalog
+
+
+def _load_snapshot(mtimes):
+    from scripts.train_model import catalog_fingerprint
+
+    with metrics.stage('catalog_load'):
+        catalog = _load_catalog()
+    with metrics.stage('model_load'):
+        bundle = _load_bundle(catalog)
+    with metrics.stage('index_load'):
+        fingerprint = catalog_fingerprint(catalog)
+        cluster_index = _cluster_index(catalog, bundle, fingerprint)
+        allergen_index = _load_allergen_index(catalog, fingerprint)
+        allergen_index["names"] = _string_array(allergen_index["names"])
+        neighbors_index = _neighbors_index(catalog, bundle, fingerprint)
+    with metrics.stage('snapshot_build'):
+        catalog, foods = _split_string_columns(catalog)
+        return Snapshot(catalog, foods, bundle, cluster_index, allergen_index, neighbors_index, mtimes)
+
+
+def use_background_reload():
+    """Stop get_snapshot() from checking the files; the caller runs refresh_snapshot() itself.
+
+    asgi_app.py does this and calls refresh_snapshot() in a thread, so a reload
+    never runs on (and blocks) the event loop.
+    """
+    global _inline_reload
+    _inline_reload = False
+
+
+def get_snapshot():
+    """Return the current snapshot, reloading it if the files changed on disk."""
+    snapshot = _snapshot
+    if snapshot is not None and not _inline_reload:
+        return snapshot
+    return refresh_snapshot()
+
+
+def refresh_snapshot():
+    """Check the files (at most every RELOAD_CHECK_INTERVAL) and reload the snapshot if they changed."""
+    global _snapshot, _last_check, _failed_mtimes, _failed_error
+
+    snapshot = _snapshot
+    now = time.monotonic()
+    if snapshot is not None and now - _last_check < RELOAD_CHECK_INTERVAL:
+        return snapshot
+
+    try:
+        mtimes = _current_mtimes()
+    except OSError:
+        if snapshot is not None:
+            # Files are being replaced; keep serving the last good snapshot
+            return snapshot
+        raise
+
+    if snapshot is not None and snapshot.mtimes == mtimes:
+        _last_check = now
+        return snapshot
+    if mtimes == _failed_mtimes:
+        # These files already failed to load; wait until they change again
+        _last_check = now
+        if snapshot is None:
+            raise RuntimeError(f"Catalog/models failed to load: {_failed_error}")
+        return snapshot
+
+    # One thread reloads; the others keep serving the current snapshot in the meantime
+    if not _lock.acquire(blocking=snapshot is None):
+        return snapshot
+    try:
+        snapshot = _snapshot
+        if (snapshot is None or snapshot.mtimes != mtimes) and mtimes != _failed_mtimes:
+            try:
+                snapshot = _load_snapshot(mtimes)
+            except Exception as e:
+                _failed_mtimes, _failed_error = mtimes, e
+                if _snapshot is None:
+                    raise
+                print(f"[WARNING] Reload of catalog/models failed, keeping previous version until the files change again: {e}")
+                snapshot = _snapshot
+            else:
+                if _snapshot is not None:
+                    print(f"[OK] Reloaded catalog and models from disk (model bundle {snapshot.model_version})")
+                _snapshot = snapshot
+                _failed_mtimes = _failed_error = None
+        elif snapshot is None:
+            raise RuntimeError(f"Catalog/models failed to load: {_failed_error}")
+        _last_check = time.monotonic()
+    finally:
+        _lock.release()
+    return snapshot
+
+
+def current_snapshot():
+    """The snapshot currently being served, or None if nothing is loaded yet (never reloads)."""
+    return _snapshot
+
+
+def food_name(snapshot, row):
+    """Catalog name of food ``row``."""
+    return str(snapshot.foods[row])
+
+
+def allowed_foods(snapshot, allergies):
+    """Boolean mask over catalog rows excluding foods that match any allergy term."""
+    from scripts.preprocess_data import excluded_food_ids
+
+    allowed = np.ones(len(snapshot.catalog), dtype=bool)
+    allowed[excluded_food_ids(snapshot.allergen_index, allergies, snapshot.allergen_term_cache)] = False
+    return allowed
+
+
+def similar_foods(snapshot, row, k, allowed=None):
+    """Return up to ``k`` (row, distance) pairs nearest to catalog ``row``, excluding itself.
+
+    Neighbours are fetched in growing batches until ``k`` of them pass the
+    ``allowed`` mask or the catalog is exhausted.
+    """
+    index = snapshot.neighbors_index
+    n_foods = len(snapshot.catalog)
+    # Take the one row before selecting features; selecting first would copy every row's features
+    features = snapshot.catalog.iloc[row][snapshot.features].to_numpy(dtype=np.float64)
+    query = ((features - index["mean"]) / index["scale"]).reshape(1, -1)
+
+    fetch = min(n_foods, 2 * k + 1)
+    while True:
+        distances, rows = index["model"].kneighbors(query, n_neighbors=fetch)
+        results = [(int(r), float(d)) for r, d in zip(rows[0], distances[0])
+                   if r != row and (allowed is None or allowed[r])]
+        if len(results) >= k or fetch == n_foods:
+            return results[:k]
+        fetch = min(n_foods, fetch * 4)
+
+
+def pick_food(snapshot, meal, allowed=None, rng=np.random):
+    """Pick a random food row from the most common ``meal`` cluster.
+
+    ``allowed`` is an optional boolean mask over catalog rows (e.g. after
+    allergy filtering); the most common cluster is then taken among allowed
+    rows only. Returns the catalog row position, or None if nothing is allowed.
+    """
+    index = snapshot.cluster_index
+    if allowed is None:
+        members = index["members"][meal][index["modal_cluster"][meal]]
+    else:
+        positions = np.flatnonzero(allowed)
+        if len(positions) == 0:
+            return None
+        labels = index["labels"][meal][positions]
+        members = positions[labels == np.bincount(labels).argmax()]
+    return int(members[rng.randint(len(members))])
+
+
+def warm_up():
+    """Load the catalog and models eagerly, e.g. at worker startup."""
+    return get_snapshot()
@@ -0,0 +1,129 @@
+# mongo_supervisor.py
+"""Background thread that gets MongoDB connected and keeps watching it.
+
+The first connection attempt, and every retry after a failure, runs off the
+request path with exponential backoff (full jitter, so many workers don't
+retry in lockstep). Once connected the server is pinged every
+``check_interval`` seconds; when a ping fails ``on_disconnected`` is called
+(the app switches to degraded mode) and the retries start again. When a ping
+succeeds after that, ``on_connected(client)`` is called again.
+
+Status: not_started -> connecting -> connected <-> reconnecting; stopped.
+"""
+import os
+import random
+import threading
+import time
+
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_RETRY_MIN_SECONDS = float(os.getenv('MONGO_RETRY_MIN_SECONDS', '1'))
+MONGO_RETRY_MAX_SECONDS = float(os.getenv('MONGO_RETRY_MAX_SECONDS', '60'))
+MONGO_HEALTH_CHECK_INTERVAL = float(os.getenv('MONGO_HEALTH_CHECK_INTERVAL', '10'))
+
+
+class MongoSupervisor:
+    def __init__(self, uri, on_connected, on_disconnected, timeout_ms=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                 min_delay=MONGO_RETRY_MIN_SECONDS, max_delay=MONGO_RETRY_MAX_SECONDS,
+                 check_interval=MONGO_HEALTH_CHECK_INTERVAL):
+        self.uri = uri
+        self._on_connected = on_connected
+        self._on_disconnected = on_disconnected
+        self.timeout_ms = timeout_ms
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.check_interval = check_interval
+
+        self._client = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._first_attempt = threading.Event()
+
+        self.status = 'not_started'
+        self.attempts = 0
+        self.failures = 0
+        self.disconnects = 0
+        self.last_error = None
+        self.connected_since = None
+        self.next_retry_at = None
+
+    def start(self):
+        self.status = 'connecting'
+        self._thread = threading.Thread(target=self._run, name='mongodb-supervisor', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread and close the client (e.g. in a preloading master before it forks)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        self.status = 'stopped'
+
+    def wait(self, timeout=None):
+        """Block until the first connection attempt has finished; True if it is connected."""
+        self._first_attempt.wait(timeout)
+        return self.status == 'connected'
+
+    @property
+    def connected(self):
+        return self.status == 'connected'
+
+    def _ping(self):
+        from pymongo import MongoClient
+
+        self.attempts += 1
+        if self._client is None:
+            # mongodb+srv URIs resolve DNS here, so creating the client can fail too
+            self._client = MongoClient(self.uri, serverSelectionTimeoutMS=self.timeout_ms)
+        self._client.admin.command('ping')
+
+    def _notify(self, callback, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"[WARNING] MongoDB supervisor callback error: {e}")
+
+    def _run(self):
+        delay = self.min_delay
+        while not self._stop.is_set():
+            try:
+                self._ping()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                wait = random.uniform(delay / 2, delay)
+                if self.status == 'connected':
+                    self.disconnects += 1
+                    self.connected_since = None
+                    print(f"[WARNING] Lost MongoDB connection, running degraded: {e}")
+                    self._notify(self._on_disconnected)
+                print(f"[ERROR] MongoDB connection error, retrying in {wait:.1f}s: {e}")
+                self.status = 'reconnecting'
+                self.next_retry_at = time.time() + wait
+                self._first_attempt.set()
+                delay = min(delay * 2, self.max_delay)
+                self._stop.wait(wait)
+                continue
+
+            if self.status != 'connected':
+                print("[OK] Connected to MongoDB successfully!")
+                self._notify(self._on_connected, self._client)
+                self.status = 'connected'
+                self.connected_since = time.time()
+                self.next_retry_at = None
+            self._first_attempt.set()
+            delay = self.min_delay
+            self._stop.wait(self.check_interval)
+
+    def stats(self):
+        return {
+            'status': self.status,
+            'attempts': self.attempts,
+            'failures': self.failures,
+            'disconnects': self.disconnects,
+            'last_error': self.last_error,
+            'connected_seconds': round(time.time() - self.connected_since, 1) if self.connected_since else None,
+            'next_retry_in_seconds': round(max(0.0, self.next_retry_at - time.time()), 1) if self.next_retry_at else None,
+        }
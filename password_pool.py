@@ -0,0 +1,111 @@
+# password_pool.py
+"""Bounded worker pool for password hashing and checking.
+
+``generate_password_hash``/``check_password_hash`` are deliberately slow.
+Running them on a small dedicated pool caps how many CPU cores a login burst
+can take from the other routes, and the pending limit turns a burst into
+fast 503s (``PasswordPoolBusy``, also raised when a hash takes longer than
+``PASSWORD_HASH_TIMEOUT``) instead of a growing backlog. The hash
+functions spend their time in OpenSSL with the GIL released, so threads are
+enough.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import metrics
+
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '32'))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+
+
+class PasswordPoolBusy(Exception):
+    """Too many hashes are already queued; the caller should retry later."""
+
+
+class PasswordPool:
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING,
+                 timeout=PASSWORD_HASH_TIMEOUT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    # Created lazily so each forked worker gets its own threads
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+        return self._executor
+
+    def _submit(self, stage, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordPoolBusy('Too many sign-in requests, please retry shortly')
+            self.pending += 1
+        queued_at = time.perf_counter()
+
+        def run():
+            if metrics.METRICS_ENABLED:
+                metrics.stage_seconds.observe(time.perf_counter() - queued_at, 'password_queue_wait')
+            try:
+                with metrics.stage(stage):
+                    return fn(*args)
+            finally:
+                with self._lock:
+                    self.pending -= 1
+                    self.completed += 1
+
+        try:
+            return self._get_executor().submit(run)
+        except Exception:
+            with self._lock:
+                self.pending -= 1
+            raise
+
+    def _timed_out(self):
+        # The hash keeps running (and counting as pending); only the caller gives up on it
+        with self._lock:
+            self.timed_out += 1
+        return PasswordPoolBusy('Sign-in is taking too long, please retry shortly')
+
+    def _result(self, future):
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            raise self._timed_out() from None
+
+    async def _result_async(self, future):
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out() from None
+
+    def hash(self, password):
+        return self._result(self._submit('password_hash', generate_password_hash, password))
+
+    def check(self, pwhash, password):
+        return self._result(self._submit('password_check', check_password_hash, pwhash, password))
+
+    async def hash_async(self, password):
+        return await self._result_async(self._submit('password_hash', generate_password_hash, password))
+
+    async def check_async(self, pwhash, password):
+        return await self._result_async(self._submit('password_check', check_password_hash, pwhash, password))
+
+    def stats(self):
+        return {'workers': self.workers, 'pending': self.pending, 'max_pending': self.max_pending,
+                'completed': self.completed, 'rejected': self.rejected, 'timed_out': self.timed_out}
@@ -0,0 +1,55 @@
+# rate_limit.py
+"""In-memory sliding-window attempt limiter (per worker), e.g. for sign-in attempts."""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class RateLimiter:
+    """Allow at most ``max_attempts`` per key within ``window`` seconds.
+
+    At most ``max_keys`` keys are tracked; the least recently seen ones are
+    forgotten first, so memory stays bounded under a spray of new IPs/emails.
+    """
+
+    def __init__(self, max_attempts, window, max_keys=10000):
+        self.max_attempts = max_attempts
+        self.window = window
+        self.max_keys = max_keys
+        self.blocked = 0
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Record an attempt for ``key``; return 0 if allowed, else seconds until it would be."""
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts is None:
+                attempts = self._attempts[key] = deque()
+                while len(self._attempts) > self.max_keys:
+                    self._attempts.popitem(last=False)
+            else:
+                self._attempts.move_to_end(key)
+            while attempts and attempts[0] <= now - self.window:
+                attempts.popleft()
+            if len(attempts) >= self.max_attempts:
+                self.blocked += 1
+                return attempts[0] + self.window - now
+            attempts.append(now)
+            return 0
+
+    def reset(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def stats(self):
+        return {'keys': len(self._attempts), 'max_attempts': self.max_attempts,
+                'window_seconds': self.window, 'blocked': self.blocked}
+
+
+def limiter_from_env(prefix, max_attempts, window):
+    """RateLimiter configured by ``<prefix>_MAX_ATTEMPTS`` / ``<prefix>_WINDOW`` environment variables."""
+    return RateLimiter(int(os.getenv(f'{prefix}_MAX_ATTEMPTS', str(max_attempts))),
+                       float(os.getenv(f'{prefix}_WINDOW', str(window))))
@@ -3,6 +3,17 @@ import pandas as pd
 import joblib
 import numpy as np
 import sqlite3
+import argparse
+import os
+
+try:
+    from scripts.preprocess_data import build_allergen_index, excluded_food_ids, load_columnar_catalog
+    from scripts.train_model import (FEATURES, LEGACY_MODEL_PATHS, build_cluster_index, catalog_fingerprint,
+                                     load_model_bundle, validate_bundle_features)
+except ImportError:  # run directly as `python scripts/predict_diet.py`
+    from preprocess_data import build_allergen_index, excluded_food_ids, load_columnar_catalog
+    from train_model import (FEATURES, LEGACY_MODEL_PATHS, build_cluster_index, catalog_fingerprint,
+                             load_model_bundle, validate_bundle_features)
 
 # -------------------------
 # Function to save user input & results to database
@@ -20,6 +31,22 @@ def save_user_data(name, gender, age, height, weight, diet_goal, food_pref, alle
     print("💾 User data and meal plan saved to database.")
 
 
+# -------------------------
+# Function to save many results in one transaction
+# -------------------------
+def save_user_data_many(rows):
+    conn = sqlite3.connect("database/diet_users.db")
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT INTO user_data 
+        (name, gender, age, height, weight, diet_goal, food_preference, allergies, calories, protein, fat, carbs, breakfast, lunch, dinner)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+    print(f"💾 {len(rows)} meal plans saved to database.")
+
+
 
 # -------------------------
 # Function to collect user input
@@ -60,55 +87,113 @@ def calculate_nutrient_requirements(age, gender, height, weight, goal):
     return calories, protein, fat, carbs
 
 
+# -------------------------
+# Vectorized version of calculate_nutrient_requirements for many profiles
+# -------------------------
+def calculate_nutrient_requirements_batch(ages, genders, heights, weights, goals):
+    ages = np.asarray(ages, dtype=float)
+    heights = np.asarray(heights, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    genders = np.asarray(genders, dtype=object)
+    goals = np.asarray(goals, dtype=object)
+
+    calories = 10 * weights + 6.25 * heights - 5 * ages + np.where(genders == "M", 5, -161)
+    calories = calories + np.select([goals == "weight_loss", goals == "muscle_gain"], [-300, 300], 0)
+
+    protein = weights * 1.2
+    fat = (0.25 * calories) / 9
+    carbs = (0.5 * calories) / 4
+
+    return calories, protein, fat, carbs
+
+
+# -------------------------
+# Function to load per-food cluster labels (from the model bundle saved by train_model.py)
+# -------------------------
+def load_cluster_labels(df, features):
+    bundle = load_model_bundle()
+    if bundle is not None:
+        validate_bundle_features(bundle, df.columns)
+        index = bundle["cluster_index"]
+        if index.get("n_foods") == len(df) and index.get("fingerprint") == catalog_fingerprint(df):
+            return index["labels"]
+        print(f"⚠️ Model bundle {bundle['version']} was trained on another catalog. Predicting clusters instead.")
+        return build_cluster_index(df, bundle["models"], bundle["features"], bundle["scaler"])["labels"]
+
+    # Models from before bundles existed: loose pickles trained on unscaled features
+    print("⚠️ No model bundle found, re-run training. Using loose model files.")
+    labels = {}
+    for meal, path in LEGACY_MODEL_PATHS.items():
+        model = joblib.load(path)
+        labels[meal] = model.predict(df[features])
+    return labels
+
+
+# -------------------------
+# Function to load the allergen index (saved by preprocess_data.py)
+# -------------------------
+def load_allergen_index(df):
+    index_path = "data/allergen_index.pkl"
+    if os.path.exists(index_path):
+        index = joblib.load(index_path)
+        if index.get("n_foods") == len(df) and index.get("names") == df["food"].astype(str).str.lower().tolist():
+            return index
+        print("⚠️ allergen_index.pkl is out of date, re-run preprocessing. Rebuilding it in memory.")
+    return build_allergen_index(df["food"].tolist())
+
+
+# -------------------------
+# Function to load the catalog (memory-mapped columnar catalog if available)
+# -------------------------
+def load_catalog():
+    df = load_columnar_catalog()
+    if df is None:
+        df = pd.read_csv("data/processed_diet.csv")
+    return df
+
+
+# -------------------------
+# Function to pick a random food from the most common cluster among allowed rows
+# -------------------------
+def pick_from_cluster(df, labels, allowed):
+    positions = np.flatnonzero(allowed)
+    meal_labels = labels[positions]
+    members = positions[meal_labels == np.bincount(meal_labels).argmax()]
+    return df["food"].iat[np.random.choice(members)]
+
+
 # -------------------------
 # Function to recommend meals
 # -------------------------
 def recommend_meals():
-    df = pd.read_csv("data/processed_diet.csv")
-
-    # Load models
-    breakfast_model = joblib.load("models/breakfast_model.pkl")
-    lunch_model = joblib.load("models/lunch_model.pkl")
-    dinner_model = joblib.load("models/dinner_model.pkl")
+    df = load_catalog()
 
     # Get user input
     name, gender, age, height, weight, goal, food_type, allergies = get_user_input()
 
     
     # Filter out allergy items
+    allowed = np.ones(len(df), dtype=bool)
     if allergies.lower() != "none" and allergies.strip() != "":
         allergy_list = [a.strip() for a in allergies.split(",")]
-        df = df[~df['food'].str.contains('|'.join(allergy_list), case=False, na=False)]
+        allowed[excluded_food_ids(load_allergen_index(df), allergy_list)] = False
         print(f"\n⚠️ Foods containing {', '.join(allergy_list)} have been removed from recommendations.")
 
     # Calculate nutrient targets
     calories, protein, fat, carbs = calculate_nutrient_requirements(age, gender, height, weight, goal)
     print(f"\n🍽 Your daily target: {calories:.0f} kcal | {protein:.0f}g protein | {fat:.0f}g fat | {carbs:.0f}g carbs")
 
-    # Features used by models
-    features = [
-        "Vitamin C (mg per 100g)",
-        "Vitamin B11 (mg per 100g)",
-        "Sodium (mg per 100g)",
-        "Calcium (mg per 100g)",
-        "Carbohydrates (g per 100g)",
-        "Iron (mg per 100g)",
-        "Calories (kcal per 100g)",
-        "Sugars (g per 100g)",
-        "Dietary Fiber (g per 100g)",
-        "Fat (g per 100g)",
-        "Protein (g per 100g)"
-    ]
-
-    # Predict clusters for each meal (based on nutrition similarity)
-    df['breakfast_cluster'] = breakfast_model.predict(df[features])
-    df['lunch_cluster'] = lunch_model.predict(df[features])
-    df['dinner_cluster'] = dinner_model.predict(df[features])
+    # Cluster labels for each meal (based on nutrition similarity)
+    labels = load_cluster_labels(df, FEATURES)
+
+    if not allowed.any():
+        print("⚠️ No foods left after removing allergens.")
+        return
 
     # Select one random item from each cluster
-    breakfast = df.sample(1).iloc[0]['food']
-    lunch = df.sample(1).iloc[0]['food']
-    dinner = df.sample(1).iloc[0]['food']
+    breakfast = pick_from_cluster(df, labels["breakfast"], allowed)
+    lunch = pick_from_cluster(df, labels["lunch"], allowed)
+    dinner = pick_from_cluster(df, labels["dinner"], allowed)
 
     print("\n🍳 Recommended Meals for You:")
     print(f"🥣 Breakfast → {breakfast}")
@@ -120,6 +205,74 @@ def recommend_meals():
                    calories, protein, fat, carbs, breakfast, lunch, dinner)
 
 
+# -------------------------
+# Function to recommend meals for a file of profiles (CSV or JSON list)
+# Columns: name, gender, age, height, weight, goal, food_type, allergies
+# -------------------------
+def recommend_meals_batch(input_path, output_path=None):
+    if input_path.lower().endswith(".json"):
+        profiles = pd.read_json(input_path)
+    else:
+        profiles = pd.read_csv(input_path)
+    profiles = profiles.fillna({"name": "", "food_type": "", "allergies": "none"})
+    profiles["gender"] = profiles["gender"].astype(str).str.strip().str.upper()
+    profiles["goal"] = profiles["goal"].astype(str).str.strip().str.lower()
+    print(f"👥 Loaded {len(profiles)} profiles from {input_path}")
+
+    # Shared catalog, cluster labels and allergen index for the whole batch
+    df = load_catalog()
+    labels = load_cluster_labels(df, FEATURES)
+    allergen_index = load_allergen_index(df)
+
+    calories, protein, fat, carbs = calculate_nutrient_requirements_batch(
+        profiles["age"], profiles["gender"], profiles["height"], profiles["weight"], profiles["goal"])
+
+    rows = []
+    results = []
+    excluded_by_allergies = {}  # profiles often share the same allergy list
+    for i, profile in enumerate(profiles.itertuples(index=False)):
+        allergies = str(profile.allergies).strip()
+        allowed = np.ones(len(df), dtype=bool)
+        if allergies.lower() != "none" and allergies != "":
+            if allergies not in excluded_by_allergies:
+                allergy_list = [a.strip() for a in allergies.split(",")]
+                excluded_by_allergies[allergies] = excluded_food_ids(allergen_index, allergy_list)
+            allowed[excluded_by_allergies[allergies]] = False
+        if not allowed.any():
+            print(f"⚠️ Skipping {profile.name}: no foods left after removing allergens.")
+            continue
+
+        breakfast = pick_from_cluster(df, labels["breakfast"], allowed)
+        lunch = pick_from_cluster(df, labels["lunch"], allowed)
+        dinner = pick_from_cluster(df, labels["dinner"], allowed)
+
+        rows.append((profile.name, profile.gender, int(profile.age), float(profile.height), float(profile.weight),
+                     profile.goal, profile.food_type, allergies, float(calories[i]), float(protein[i]),
+                     float(fat[i]), float(carbs[i]), breakfast, lunch, dinner))
+        results.append({"name": profile.name, "calories": round(float(calories[i])),
+                        "protein": round(float(protein[i])), "fat": round(float(fat[i])),
+                        "carbs": round(float(carbs[i])), "breakfast": breakfast, "lunch": lunch, "dinner": dinner})
+
+    results = pd.DataFrame(results)
+    print(results.to_string(index=False))
+
+    if output_path:
+        results.to_csv(output_path, index=False)
+        print(f"✅ Results written to {output_path}")
+
+    # ✅ Save everything to the database in one transaction
+    if rows:
+        save_user_data_many(rows)
+
+
 # -------------------------
 if __name__ == "__main__":
-    recommend_meals()
+    parser = argparse.ArgumentParser(description="Personalized diet recommendations")
+    parser.add_argument("--batch", metavar="PROFILES", help="CSV or JSON file of profiles to process in one run")
+    parser.add_argument("--output", metavar="CSV", help="write batch results to this CSV file")
+    args = parser.parse_args()
+
+    if args.batch:
+        recommend_meals_batch(args.batch, args.output)
+    else:
+        recommend_meals()
@@ -1,13 +1,309 @@
 # scripts/preprocess_data.py
 import pandas as pd
+import numpy as np
+import joblib
+import argparse
+import hashlib
+import json
+import re
 import os
+import shutil
+import sys
+import time
+
+ALLERGEN_INDEX_VERSION = 1
+
+# Columnar catalog: float32 nutrient matrix + UTF-8 string tables, all .npy so they can be memory-mapped
+CATALOG_FORMAT = "nutridiet-columnar"
+CATALOG_FORMAT_VERSION = 1
+COLUMNAR_CATALOG_DIR = "data/catalog"
+
+# Streaming mode: row hashes and column means of the last run, and a log of run statistics
+PREPROCESS_STATE_PATH = "data/preprocess_state.npz"
+PREPROCESS_RUN_LOG = "data/preprocess_runs.jsonl"
+DEFAULT_CHUNKSIZE = 100_000
+
+# Useful columns kept in the processed dataset
+SELECTED_COLUMNS = [
+    "Vitamin C (mg per 100g)",
+    "Vitamin B11 (mg per 100g)",
+    "Sodium (mg per 100g)",
+    "Calcium (mg per 100g)",
+    "Carbohydrates (g per 100g)",
+    "Iron (mg per 100g)",
+    "Calories (kcal per 100g)",
+    "Sugars (g per 100g)",
+    "Dietary Fiber (g per 100g)",
+    "Fat (g per 100g)",
+    "Protein (g per 100g)",
+    "food",
+    "food_normalized"
+]
+STRING_COLUMNS = ["food", "food_normalized"]
+
+INVALID_FOODS = ["beer", "wine", "vodka", "alcohol", "rum", "cocktail"]
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize_food_name(name):
+    """Split a food name into lowercase word tokens."""
+    return _TOKEN_RE.findall(str(name).lower())
+
+
+class AllergenIndexBuilder:
+    """Build the allergen index from food names added a chunk at a time (see build_allergen_index)."""
+
+    def __init__(self):
+        self.names = []
+        self._postings = {}
+        self._digest = hashlib.sha1()
+
+    def add(self, foods):
+        start = len(self.names)
+        postings = {}
+        for food_id, name in enumerate(foods, start=start):
+            if food_id:
+                self._digest.update(b"\n")
+            self._digest.update(str(name).encode("utf-8"))
+            self.names.append(str(name).lower())
+            if not isinstance(name, str):
+                continue
+            for token in set(tokenize_food_name(name)):
+                postings.setdefault(token, []).append(food_id)
+        for token, ids in postings.items():
+            self._postings.setdefault(token, []).append(np.array(ids, dtype=np.int32))
+
+    def build(self):
+        return {
+            "version": ALLERGEN_INDEX_VERSION,
+            "n_foods": len(self.names),
+            "fingerprint": self._digest.hexdigest(),
+            "names": self.names,
+            "tokens": {token: np.concatenate(ids) for token, ids in self._postings.items()},
+        }
+
+
+def build_allergen_index(foods):
+    """Build an inverted index from name token to ids of the foods containing it.
+
+    Food ids are row positions in data/processed_diet.csv.
+    """
+    builder = AllergenIndexBuilder()
+    builder.add(foods)
+    return builder.build()
+
+
+def _term_food_ids(index, term, cache=None):
+    """Ids of foods whose name contains ``term`` (already lowercased) as a literal substring."""
+    ids = cache.get(term) if cache is not None else None
+    if ids is not None:
+        return ids
+
+    words = tokenize_food_name(term)
+    ids = np.empty(0, dtype=np.int32)
+    if words:
+        candidates = None
+        for word in words:
+            postings = [food_ids for token, food_ids in index["tokens"].items() if word in token]
+            word_ids = np.unique(np.concatenate(postings)) if postings else ids
+            candidates = word_ids if candidates is None else np.intersect1d(candidates, word_ids)
+        if words != [term]:
+            # Terms spanning several words (or punctuation) are checked against the full name
+            names = index["names"]
+            candidates = np.array([i for i in candidates if term in names[i]], dtype=np.int32)
+        ids = candidates
+
+    if cache is not None:
+        cache.set(term, ids)
+    return ids
+
+
+def excluded_food_ids(index, allergies, cache=None):
+    """Ids of foods whose name contains any of the allergy terms (case-insensitive).
+
+    ``cache`` is an optional cache of per-term results (``get``/``set``, e.g.
+    cache.LRUCache) owned by the caller; the index itself is never modified.
+    """
+    matched = [_term_food_ids(index, term.strip().lower(), cache) for term in allergies if term.strip()]
+    if not matched:
+        return np.empty(0, dtype=np.int32)
+    return np.unique(np.concatenate(matched))
+
+
+def _save_atomic(path, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _write_npy(f, dtype, shape, data):
+    """Write an .npy header for ``shape``/``dtype``, then the raw C-order values from file ``data``."""
+    np.lib.format.write_array_header_1_0(f, {
+        "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+        "fortran_order": False,
+        "shape": shape,
+    })
+    shutil.copyfileobj(data, f)
+
+
+class ColumnarCatalogWriter:
+    """Write a memory-mappable columnar catalog one chunk at a time.
+
+    Each chunk is appended to raw ``.part`` files, so only one chunk is held in
+    memory; finish() adds the .npy headers once the row count is known and
+    writes the manifest.
+    """
+
+    def __init__(self, numeric_columns, string_columns, out_dir=COLUMNAR_CATALOG_DIR):
+        os.makedirs(out_dir, exist_ok=True)
+        self.numeric_columns = list(numeric_columns)
+        self.string_columns = list(string_columns)
+        self.out_dir = out_dir
+        self.n_rows = 0
+        self._string_bytes = {column: 0 for column in self.string_columns}
+        self._parts = {}
+        self._open_part("nutrients.npy")
+        for column in self.string_columns:
+            self._open_part(f"{column}.offsets.npy").write(np.zeros(1, dtype=np.int64).tobytes())
+            self._open_part(f"{column}.strings.npy")
+
+    def _open_part(self, name):
+        part = open(os.path.join(self.out_dir, name + ".part"), "wb")
+        self._parts[name] = part
+        return part
+
+    def append(self, df):
+        nutrients = np.ascontiguousarray(df[self.numeric_columns].to_numpy(dtype=np.float32))
+        self._parts["nutrients.npy"].write(nutrients.tobytes())
+
+        for column in self.string_columns:
+            # Missing values are stored as empty strings, like an empty CSV field
+            encoded = [value.encode("utf-8") if isinstance(value, str) else b"" for value in df[column]]
+            offsets = self._string_bytes[column] + np.cumsum([len(value) for value in encoded], dtype=np.int64)
+            self._parts[f"{column}.offsets.npy"].write(offsets.tobytes())
+            self._parts[f"{column}.strings.npy"].write(b"".join(encoded))
+            if len(offsets):
+                self._string_bytes[column] = int(offsets[-1])
+        self.n_rows += len(df)
+
+    def finish(self, csv_path):
+        """Turn the parts into .npy files and write the manifest for ``csv_path`` (already saved)."""
+        arrays = {"nutrients.npy": (np.float32, (self.n_rows, len(self.numeric_columns)))}
+        for column in self.string_columns:
+            arrays[f"{column}.offsets.npy"] = (np.int64, (self.n_rows + 1,))
+            arrays[f"{column}.strings.npy"] = (np.uint8, (self._string_bytes[column],))
+
+        for name, (dtype, shape) in arrays.items():
+            part = self._parts.pop(name)
+            part.close()
+            with open(part.name, "rb") as data:
+                _save_atomic(os.path.join(self.out_dir, name), lambda f: _write_npy(f, dtype, shape, data))
+            os.remove(part.name)
+
+        # The manifest is written last so readers never see a half-written catalog
+        source = os.stat(csv_path)
+        manifest = {
+            "format": CATALOG_FORMAT,
+            "version": CATALOG_FORMAT_VERSION,
+            "n_rows": self.n_rows,
+            "numeric_columns": self.numeric_columns,
+            "numeric_dtype": "float32",
+            "string_columns": self.string_columns,
+            "source": {"path": csv_path, "size": source.st_size, "mtime_ns": source.st_mtime_ns},
+        }
+        _save_atomic(os.path.join(self.out_dir, "manifest.json"),
+                     lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")))
+
+
+def write_columnar_catalog(df, numeric_columns, string_columns, csv_path, out_dir=COLUMNAR_CATALOG_DIR):
+    """Write ``df`` as a memory-mappable columnar catalog next to the CSV it was saved to."""
+    writer = ColumnarCatalogWriter(numeric_columns, string_columns, out_dir)
+    writer.append(df)
+    writer.finish(csv_path)
+
+
+def read_string_column(in_dir, column, mmap_mode="r"):
+    """Decode one string table of a columnar catalog into a list (empty strings become NaN)."""
+    offsets = np.load(os.path.join(in_dir, f"{column}.offsets.npy"), mmap_mode=mmap_mode)
+    blob = np.load(os.path.join(in_dir, f"{column}.strings.npy"), mmap_mode=mmap_mode)
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[start:end].decode("utf-8") if end > start else np.nan
+            for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def load_columnar_catalog(csv_path="data/processed_diet.csv", in_dir=COLUMNAR_CATALOG_DIR):
+    """Open the columnar catalog as a DataFrame whose nutrient columns are memory-mapped.
+
+    Returns None if the catalog is missing, of another version, or older than
+    ``csv_path`` (callers then fall back to reading the CSV).
+    """
+    manifest_path = os.path.join(in_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != CATALOG_FORMAT or manifest.get("version") != CATALOG_FORMAT_VERSION:
+        return None
+    if os.path.exists(csv_path):
+        source = os.stat(csv_path)
+        if (manifest["source"]["size"], manifest["source"]["mtime_ns"]) != (source.st_size, source.st_mtime_ns):
+            return None
+
+    nutrients = np.load(os.path.join(in_dir, "nutrients.npy"), mmap_mode="r")
+    if nutrients.shape != (manifest["n_rows"], len(manifest["numeric_columns"])):
+        return None
+
+    # Wrapping the mmap (copy=False) keeps the nutrient values in the shared page cache
+    df = pd.DataFrame(nutrients, columns=manifest["numeric_columns"], copy=False)
+    for column in manifest["string_columns"]:
+        df[column] = read_string_column(in_dir, column)
+    return df
+
+
+def _peak_memory_mb():
+    """Peak resident memory of this process in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _report_run(stats, started):
+    stats["wall_time_s"] = round(time.perf_counter() - started, 3)
+    stats["peak_memory_mb"] = _peak_memory_mb()
+    stats["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    print(f"⏱ {stats['wall_time_s']}s wall time, peak memory {stats['peak_memory_mb']} MB")
+    os.makedirs(os.path.dirname(PREPROCESS_RUN_LOG), exist_ok=True)
+    with open(PREPROCESS_RUN_LOG, "a", encoding="utf-8") as f:
+        f.write(json.dumps(stats) + "\n")
+
+
+def _drop_invalid_foods(df):
+    return df[~df["food_normalized"].str.contains('|'.join(INVALID_FOODS), case=False, na=False)]
+
+
+def _write_derived_artifacts(df):
+    # Save the same data as a memory-mappable columnar catalog
+    write_columnar_catalog(df, SELECTED_COLUMNS[:-2], STRING_COLUMNS, "data/processed_diet.csv")
+
+    # Save allergen lookup index (food name token -> food ids)
+    joblib.dump(build_allergen_index(df["food"].tolist()), "data/allergen_index.pkl")
+
 
 def preprocess_data():
+    started = time.perf_counter()
     print("🔄 Preprocessing nutrition dataset...")
 
     # Load dataset
     df = pd.read_csv("data/nutritions.csv")
     print("✅ Dataset loaded successfully! Rows:", df.shape[0])
+    input_rows = df.shape[0]
 
 
     # Drop duplicate rows, if any
@@ -17,31 +313,122 @@ def preprocess_data():
     df.fillna(df.mean(numeric_only=True), inplace=True)
 
     # Keep only the useful columns
-    selected_columns = [
-        "Vitamin C (mg per 100g)",
-        "Vitamin B11 (mg per 100g)",
-        "Sodium (mg per 100g)",
-        "Calcium (mg per 100g)",
-        "Carbohydrates (g per 100g)",
-        "Iron (mg per 100g)",
-        "Calories (kcal per 100g)",
-        "Sugars (g per 100g)",
-        "Dietary Fiber (g per 100g)",
-        "Fat (g per 100g)",
-        "Protein (g per 100g)",
-        "food",
-        "food_normalized"
-    ]
-    df = df[selected_columns]
-
-    invalid_foods = ["beer", "wine", "vodka", "alcohol", "rum", "cocktail"]
-    df = df[~df["food_normalized"].str.contains('|'.join(invalid_foods), case=False, na=False)]
+    df = df[SELECTED_COLUMNS]
+
+    df = _drop_invalid_foods(df)
 
     # Save processed dataset
     os.makedirs("data", exist_ok=True)
     df.to_csv("data/processed_diet.csv", index=False)
 
-    print("✅ Data preprocessing complete! Saved to data/processed_diet.csv")
+    _write_derived_artifacts(df)
+
+    print("✅ Data preprocessing complete! Saved to data/processed_diet.csv, data/catalog/ and data/allergen_index.pkl")
+    _report_run({"mode": "full", "input_rows": input_rows, "output_rows": len(df)}, started)
+
+
+def preprocess_data_streaming(input_path="data/nutritions.csv", chunksize=DEFAULT_CHUNKSIZE, force=False):
+    """Chunked version of preprocess_data() for datasets that don't fit in memory.
+
+    Pass 1 hashes every row, drops duplicates and accumulates column sums and
+    counts for the means; pass 2 fills and filters each chunk and appends it to
+    the processed CSV and the columnar catalog, and adds its names to the
+    allergen index. Apart from the current chunk only the row hashes (8 bytes
+    per row) and the allergen index (food names and token postings) are kept in
+    memory. When the deduplicated row hashes and the means match the previous
+    run, the outputs are already up to date and nothing is rewritten.
+    """
+    started = time.perf_counter()
+    print(f"🔄 Preprocessing nutrition dataset in chunks of {chunksize} rows...")
+
+    columns = pd.read_csv(input_path, nrows=0).columns.tolist()
+    numeric_columns = [column for column in columns if column not in STRING_COLUMNS]
+    # Fixed dtypes so the same row hashes the same in every chunk
+    dtypes = {column: "float64" for column in numeric_columns}
+    dtypes.update({column: "object" for column in STRING_COLUMNS})
+
+    # Pass 1: row hashes, duplicates and running column sums/counts
+    seen = np.empty(0, dtype=np.uint64)
+    keep_masks = []
+    kept_hashes = []
+    sums = pd.Series(0.0, index=numeric_columns)
+    counts = pd.Series(0, index=numeric_columns)
+    input_rows = 0
+    for chunk in pd.read_csv(input_path, dtype=dtypes, chunksize=chunksize):
+        hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        keep = np.zeros(len(chunk), dtype=bool)
+        keep[np.unique(hashes, return_index=True)[1]] = True
+        keep &= ~np.isin(hashes, seen)
+        seen = np.union1d(seen, hashes[keep])
+
+        kept = chunk[keep]
+        sums += kept[numeric_columns].sum()
+        counts += kept[numeric_columns].count()
+        keep_masks.append(keep)
+        kept_hashes.append(hashes[keep])
+        input_rows += len(chunk)
+
+    means = sums / counts.replace(0, np.nan)
+    row_hashes = np.concatenate(kept_hashes) if kept_hashes else np.empty(0, dtype=np.uint64)
+    print(f"✅ Scanned {input_rows} rows, {len(row_hashes)} unique")
+
+    # Compare with the previous run
+    stats = {"mode": "stream", "chunksize": chunksize, "input_rows": input_rows, "unique_rows": len(row_hashes)}
+    previous = np.load(PREPROCESS_STATE_PATH, allow_pickle=False) if os.path.exists(PREPROCESS_STATE_PATH) else None
+    if previous is not None:
+        previous_hashes = previous["hashes"]
+        stats["new_or_changed_rows"] = int((~np.isin(row_hashes, previous_hashes)).sum())
+        stats["removed_rows"] = int((~np.isin(previous_hashes, row_hashes)).sum())
+        up_to_date = (
+            not force
+            and os.path.exists("data/processed_diet.csv")
+            and previous["columns"].tolist() == numeric_columns
+            and np.array_equal(previous_hashes, row_hashes)
+            and np.allclose(previous["means"], means.to_numpy(), equal_nan=True)
+        )
+        if up_to_date:
+            print("✅ No rows changed since the last run, outputs are up to date.")
+            stats["output_rows"] = None
+            stats["skipped"] = True
+            _report_run(stats, started)
+            return
+        print(f"🔁 {stats['new_or_changed_rows']} new or changed rows, {stats['removed_rows']} removed since the last run")
+    else:
+        stats["new_or_changed_rows"] = len(row_hashes)
+        stats["removed_rows"] = 0
+
+    # Pass 2: fill missing values, keep useful columns, drop invalid foods and append each chunk to the outputs
+    os.makedirs("data", exist_ok=True)
+    tmp_path = "data/processed_diet.csv.tmp"
+    pd.DataFrame(columns=SELECTED_COLUMNS).to_csv(tmp_path, index=False)
+    catalog = ColumnarCatalogWriter(SELECTED_COLUMNS[:-2], STRING_COLUMNS)
+    allergens = AllergenIndexBuilder()
+    reader = pd.read_csv(input_path, dtype=dtypes, chunksize=chunksize)
+    for chunk, keep in zip(reader, keep_masks):
+        chunk = chunk[keep].fillna(means)[SELECTED_COLUMNS]
+        chunk = _drop_invalid_foods(chunk)
+        chunk.to_csv(tmp_path, mode="a", header=False, index=False)
+        catalog.append(chunk)
+        allergens.add(chunk["food"].tolist())
+    os.replace(tmp_path, "data/processed_diet.csv")
+
+    catalog.finish("data/processed_diet.csv")
+    joblib.dump(allergens.build(), "data/allergen_index.pkl")
+    np.savez(PREPROCESS_STATE_PATH, hashes=row_hashes, means=means.to_numpy(), columns=np.array(numeric_columns))
+
+    print("✅ Data preprocessing complete! Saved to data/processed_diet.csv, data/catalog/ and data/allergen_index.pkl")
+    stats["output_rows"] = catalog.n_rows
+    _report_run(stats, started)
+
 
 if __name__ == "__main__":
-    preprocess_data()
+    parser = argparse.ArgumentParser(description="Preprocess the nutrition dataset")
+    parser.add_argument("--stream", action="store_true", help="process the input in chunks and skip unchanged data")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk in --stream mode")
+    parser.add_argument("--force", action="store_true", help="rewrite outputs even if nothing changed")
+    args = parser.parse_args()
+
+    if args.stream:
+        preprocess_data_streaming(chunksize=args.chunksize, force=args.force)
+    else:
+        preprocess_data()
@@ -1,43 +1,315 @@
 # scripts/train_model.py
 import pandas as pd
-from sklearn.cluster import KMeans
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import StandardScaler
 import joblib
+import argparse
+import hashlib
+import json
 import os
+import time
+import tracemalloc
 
-def train_models():
-    print("🏋️ Training meal recommendation models...")
+try:
+    from scripts.preprocess_data import load_columnar_catalog
+except ImportError:  # run directly as `python scripts/train_model.py`
+    from preprocess_data import load_columnar_catalog
+
+CLUSTER_INDEX_VERSION = 1
+NEIGHBORS_INDEX_VERSION = 1
+
+# Nutrient features the meal models cluster on
+FEATURES = [
+    "Vitamin C (mg per 100g)",
+    "Vitamin B11 (mg per 100g)",
+    "Sodium (mg per 100g)",
+    "Calcium (mg per 100g)",
+    "Carbohydrates (g per 100g)",
+    "Iron (mg per 100g)",
+    "Calories (kcal per 100g)",
+    "Sugars (g per 100g)",
+    "Dietary Fiber (g per 100g)",
+    "Fat (g per 100g)",
+    "Protein (g per 100g)"
+]
+
+# Number of clusters per meal model
+MEAL_CLUSTERS = {"breakfast": 4, "lunch": 5, "dinner": 6}
+
+TRAINING_REPORT_PATH = "models/training_report.json"
+
+# Loose pickles from before bundles existed (trained on unscaled FEATURES), used when no bundle is active
+LEGACY_MODEL_PATHS = {meal: f"models/{meal}_model.pkl" for meal in MEAL_CLUSTERS}
+
+# Versioned model bundles: models/bundles/<version>/{bundle.joblib,manifest.json};
+# models/CURRENT names the version serving should use
+BUNDLE_FORMAT = "nutridiet-model-bundle"
+BUNDLE_FORMAT_VERSION = 1
+BUNDLES_DIR = "models/bundles"
+CURRENT_BUNDLE_PATH = "models/CURRENT"
 
-    # Load preprocessed data
-    df = pd.read_csv("data/processed_diet.csv")
-
-    # Features for clustering
-    features = [
-        "Vitamin C (mg per 100g)",
-        "Vitamin B11 (mg per 100g)",
-        "Sodium (mg per 100g)",
-        "Calcium (mg per 100g)",
-        "Carbohydrates (g per 100g)",
-        "Iron (mg per 100g)",
-        "Calories (kcal per 100g)",
-        "Sugars (g per 100g)",
-        "Dietary Fiber (g per 100g)",
-        "Fat (g per 100g)",
-        "Protein (g per 100g)"
-    ]
 
+def catalog_fingerprint(df):
+    """Identify a catalog by its food names so stale indexes can be detected."""
+    return hashlib.sha1("\n".join(df["food"].astype(str)).encode("utf-8")).hexdigest()
+
+
+def build_cluster_index(df, models, features, scaler=None):
+    """Precompute per-food cluster labels and cluster membership for each meal model.
+
+    Row ids are positions in ``df`` (i.e. in data/processed_diet.csv). Pass the
+    bundle's ``scaler`` when the models were trained on scaled features.
+    """
     X = df[features]
+    if scaler is not None:
+        X = scaler.transform(X)
+    index = {
+        "version": CLUSTER_INDEX_VERSION,
+        "n_foods": len(df),
+        "fingerprint": catalog_fingerprint(df),
+        "labels": {},
+        "members": {},
+        "modal_cluster": {},
+    }
+    for meal, model in models.items():
+        labels = np.asarray(model.predict(X), dtype=np.int32)
+        counts = np.bincount(labels, minlength=model.n_clusters)
+        index["labels"][meal] = labels
+        index["members"][meal] = {
+            cluster: np.flatnonzero(labels == cluster).astype(np.int32)
+            for cluster in range(model.n_clusters)
+        }
+        index["modal_cluster"][meal] = int(counts.argmax())
+    return index
 
-    # Create folder for models
-    os.makedirs("models", exist_ok=True)
 
-    # Train 3 separate KMeans models (for 3 meals)
-    for meal, k in zip(["breakfast", "lunch", "dinner"], [4, 5, 6]):
+def build_neighbors_index(df, features):
+    """Nearest-neighbour index over standardized nutrient features for meal substitutions."""
+    X = df[features].to_numpy(dtype=np.float64)
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1.0
+    model = NearestNeighbors(algorithm="auto")
+    model.fit((X - mean) / scale)
+    return {
+        "version": NEIGHBORS_INDEX_VERSION,
+        "n_foods": len(df),
+        "fingerprint": catalog_fingerprint(df),
+        "features": list(features),
+        "mean": mean,
+        "scale": scale,
+        "model": model,
+    }
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def activate_model_bundle(version):
+    """Point models/CURRENT at ``version``; running workers pick it up on their next reload check."""
+    if not os.path.exists(os.path.join(BUNDLES_DIR, version, "manifest.json")):
+        raise FileNotFoundError(f"Model bundle {version} not found in {BUNDLES_DIR}")
+    tmp_path = CURRENT_BUNDLE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, CURRENT_BUNDLE_PATH)
+
+
+def active_bundle_version():
+    """Version named in models/CURRENT, or None if no bundle has been activated."""
+    if not os.path.exists(CURRENT_BUNDLE_PATH):
+        return None
+    with open(CURRENT_BUNDLE_PATH, encoding="utf-8") as f:
+        return f.read().strip() or None
+
+
+def save_model_bundle(bundle, activate=True):
+    """Write ``bundle`` to models/bundles/<version>/ with a checksum manifest."""
+    version = bundle["version"]
+    bundle_dir = os.path.join(BUNDLES_DIR, version)
+    os.makedirs(bundle_dir, exist_ok=True)
+    bundle_path = os.path.join(bundle_dir, "bundle.joblib")
+    joblib.dump(bundle, bundle_path)
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "version": version,
+        "created_at": bundle["created_at"],
+        "features": bundle["features"],
+        "meals": {meal: int(model.n_clusters) for meal, model in bundle["models"].items()},
+        "catalog_fingerprint": bundle["cluster_index"]["fingerprint"],
+        "files": {"bundle.joblib": {"sha256": _sha256(bundle_path), "bytes": os.path.getsize(bundle_path)}},
+    }
+    with open(os.path.join(bundle_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    if activate:
+        activate_model_bundle(version)
+    return bundle_dir
+
+
+def load_model_bundle(version=None):
+    """Load and verify a model bundle (the active one by default); None if none is active."""
+    version = version or active_bundle_version()
+    if version is None:
+        return None
+
+    bundle_dir = os.path.join(BUNDLES_DIR, version)
+    with open(os.path.join(bundle_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT or manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Model bundle {version} has an unsupported format")
+
+    for name, info in manifest["files"].items():
+        if _sha256(os.path.join(bundle_dir, name)) != info["sha256"]:
+            raise ValueError(f"Model bundle {version}: checksum mismatch for {name}")
+
+    bundle = joblib.load(os.path.join(bundle_dir, "bundle.joblib"))
+    if bundle.get("version") != version or bundle.get("features") != manifest["features"]:
+        raise ValueError(f"Model bundle {version} does not match its manifest")
+    return bundle
+
+
+def validate_bundle_features(bundle, columns):
+    """Raise ValueError if the catalog lacks any feature the bundle was trained on."""
+    missing = [feature for feature in bundle["features"] if feature not in columns]
+    if missing:
+        raise ValueError(f"Model bundle {bundle['version']} needs columns missing from the catalog: {missing}")
+
+
+def fit_meal_model(meal, k, X, minibatch=False, chunksize=None, epochs=3):
+    """Fit one meal model and return it with its fit time, inertia and peak traced memory.
+
+    With ``minibatch`` a MiniBatchKMeans is used; if ``chunksize`` is also set
+    it is trained with ``partial_fit`` over row chunks of ``X`` for ``epochs``
+    passes instead of seeing the whole catalog at once.
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    if not minibatch:
         model = KMeans(n_clusters=k, random_state=42)
         model.fit(X)
-        joblib.dump(model, f"models/{meal}_model.pkl")
-        print(f"✅ Saved {meal}_model.pkl")
+        inertia = float(model.inertia_)
+    elif not chunksize:
+        model = MiniBatchKMeans(n_clusters=k, random_state=42, n_init=3)
+        model.fit(X)
+        inertia = float(model.inertia_)
+    else:
+        model = MiniBatchKMeans(n_clusters=k, random_state=42, batch_size=chunksize)
+        chunks = [X[i:i + chunksize] for i in range(0, len(X), chunksize)]
+        for _ in range(epochs):
+            for chunk in chunks:
+                if len(chunk) >= k:
+                    model.partial_fit(chunk)
+        # partial_fit doesn't track inertia; score() is minus the inertia of a chunk
+        inertia = float(sum(-model.score(chunk) for chunk in chunks))
+
+    fit_seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = {
+        "meal": meal,
+        "algorithm": type(model).__name__,
+        "n_clusters": k,
+        "n_samples": len(X),
+        "fit_seconds": round(fit_seconds, 3),
+        "inertia": inertia,
+        "peak_memory_mb": round(peak / (1024 * 1024), 1),
+    }
+    return meal, model, stats
+
+
+def train_models(parallel=False, n_jobs=None, minibatch=False, chunksize=None, epochs=3,
+                 version=None, activate=True):
+    started = time.perf_counter()
+    print("🏋️ Training meal recommendation models...")
+
+    # Load preprocessed data (memory-mapped columnar catalog if available)
+    df = load_columnar_catalog()
+    if df is None:
+        df = pd.read_csv("data/processed_diet.csv")
+
+    features = FEATURES
+
+    # Standardize features so large-magnitude nutrients (sodium) don't dominate small ones (iron)
+    scaler = StandardScaler()
+    X = scaler.fit_transform(df[features])
+
+    # Create folder for models
+    os.makedirs("models", exist_ok=True)
+
+    # Train 3 separate KMeans models (for 3 meals), optionally one process per model
+    fit_args = [(meal, k, X, minibatch, chunksize, epochs) for meal, k in MEAL_CLUSTERS.items()]
+    if parallel:
+        results = joblib.Parallel(n_jobs=n_jobs or len(fit_args), backend="loky")(
+            joblib.delayed(fit_meal_model)(*args) for args in fit_args)
+    else:
+        results = [fit_meal_model(*args) for args in fit_args]
+
+    models = {}
+    report = []
+    for meal, model, stats in results:
+        models[meal] = model
+        report.append(stats)
+        print(f"✅ Trained {meal} model ({stats['algorithm']}, {stats['fit_seconds']}s, "
+              f"inertia {stats['inertia']:.4g}, peak {stats['peak_memory_mb']} MB)")
+
+    # One versioned bundle: scaler, models, cluster assignments and nearest-neighbour index
+    version = version or time.strftime("%Y%m%d-%H%M%S")
+    bundle = {
+        "format": BUNDLE_FORMAT,
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "features": list(features),
+        "scaler": scaler,
+        "models": models,
+        "cluster_index": build_cluster_index(df, models, features, scaler),
+        "neighbors_index": build_neighbors_index(df, features),
+        "training_report": report,
+    }
+    bundle_dir = save_model_bundle(bundle, activate=activate)
+    print(f"✅ Saved model bundle {version} to {bundle_dir}" + (" (active)" if activate else ""))
+
+    # Keep fit statistics of this run next to the models
+    with open(TRAINING_REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": version,
+            "parallel": parallel,
+            "minibatch": minibatch,
+            "chunksize": chunksize,
+            "total_seconds": round(time.perf_counter() - started, 3),
+            "models": report,
+        }, f, indent=2)
 
     print("🎯 Training completed!")
 
 if __name__ == "__main__":
-    train_models()
+    parser = argparse.ArgumentParser(description="Train the meal clustering models")
+    parser.add_argument("--parallel", action="store_true", help="fit the three meal models in separate processes")
+    parser.add_argument("--n-jobs", type=int, default=None, help="worker processes for --parallel (default: 3)")
+    parser.add_argument("--minibatch", action="store_true", help="use MiniBatchKMeans instead of KMeans")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="with --minibatch, train with partial_fit over chunks of this many rows")
+    parser.add_argument("--epochs", type=int, default=3, help="passes over the chunks with --chunksize")
+    parser.add_argument("--version", help="bundle version name (default: current timestamp)")
+    parser.add_argument("--no-activate", action="store_true", help="save the bundle without making it current")
+    parser.add_argument("--activate", metavar="VERSION", help="switch serving to an existing bundle and exit")
+    args = parser.parse_args()
+
+    if args.activate:
+        activate_model_bundle(args.activate)
+        print(f"✅ Model bundle {args.activate} is now active")
+    else:
+        train_models(parallel=args.parallel, n_jobs=args.n_jobs, minibatch=args.minibatch,
+                     chunksize=args.chunksize, epochs=args.epochs, version=args.version,
+                     activate=not args.no_activate)
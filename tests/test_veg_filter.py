@@ -0,0 +1,41 @@
+import pytest
+
+from veg_filter import is_nonveg
+
+VEGETARIAN = [
+    "graham crackers",
+    "chamomile tea",
+    "gooseberries",
+    "gooseberry chutney",
+    "lambs quarters raw",
+    "potato scalloped",
+    "meatless chicken",
+    "meatless meatballs",
+    "bacon meatless",
+    "vegetarian egg kofta curry",
+    "khaman (dhokla)",
+]
+
+NON_VEGETARIAN = [
+    "chicken tikka masala",
+    "hams",
+    "bagel with ham egg cheese",
+    "roast goose",
+    "geese",
+    "lamb liver cooked",
+    "meatballs",
+    "scallops",
+    "sardines",
+    "catfish",
+    "cod liver fish oil",
+]
+
+
+@pytest.mark.parametrize("name", VEGETARIAN)
+def test_vegetarian_names(name):
+    assert not is_nonveg(name)
+
+
+@pytest.mark.parametrize("name", NON_VEGETARIAN)
+def test_non_vegetarian_names(name):
+    assert is_nonveg(name)
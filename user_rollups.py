@@ -0,0 +1,147 @@
+# user_rollups.py
+"""Per-user rollup documents, maintained as user_data entries are written.
+
+One small document per user (``user_rollups``, ``_id`` = user id) holds what
+the dashboard and ``/api/user/latest`` need, so they read a single document
+instead of the user's whole history:
+
+    latest          the newest entry (as returned by get_user_data)
+    first_weight    weight of the oldest entry (first_at)
+    last_weight     weight of the newest entry (last_at)
+    min_bmi/max_bmi running BMI range
+    entries         number of entries
+    weeks           last ROLLUP_WEEKS weekly buckets (sums + counts, oldest first)
+    recent_meals    last RECENT_MEALS meal picks
+
+Every entry becomes a handful of single-document atomic updates ($inc, $min,
+$max, conditional $set, $push with $sort/$slice), sent in one ordered bulk
+write per batch, so concurrent writers and out-of-order journal replays
+converge on the same document.  Rollups are derived data: if an update is
+lost they can be rebuilt from user_data (``python -m database.backfill_rollups``).
+"""
+from datetime import datetime, timedelta
+
+import metrics
+from dashboard_aggregation import DASHBOARD_HISTORY_WEEKS
+
+ROLLUPS_COLLECTION = 'user_rollups'
+ROLLUP_WEEKS = DASHBOARD_HISTORY_WEEKS
+RECENT_MEALS = 7
+
+MEAL_FIELDS = ("breakfast", "lunch", "dinner")
+
+
+def week_start(created_at):
+    """Monday 00:00 of the week ``created_at`` falls in (same buckets as dashboard_aggregation)."""
+    day = created_at.date()
+    return datetime.combine(day - timedelta(days=day.weekday()), datetime.min.time())
+
+
+def rollup_operations(document):
+    """Bulk-write operations folding one inserted user_data document into its user's rollup."""
+    from pymongo import UpdateOne
+
+    user_id = document.get("user_id")
+    if not user_id:
+        return []
+
+    at = document["created_at"]
+    weight = float(document["weight"])
+    bmi = weight / ((document["height"] / 100) ** 2)
+    calories = float(document.get("calories") or 0)
+    week = week_start(at)
+    latest = {key: value for key, value in document.items() if key != "_id"}
+    latest["id"] = str(document["_id"])
+    key = {"_id": str(user_id)}
+
+    return [
+        UpdateOne(key, {
+            "$inc": {"entries": 1},
+            "$min": {"min_bmi": bmi},
+            "$max": {"max_bmi": bmi},
+            "$push": {"recent_meals": {
+                "$each": [dict({field: document.get(field) for field in MEAL_FIELDS}, created_at=at)],
+                "$sort": {"created_at": 1},
+                "$slice": -RECENT_MEALS
+            }}
+        }, upsert=True),
+        # Only move the first/last markers forward (replays can deliver older entries late)
+        UpdateOne(dict(key, **{"$or": [{"first_at": None}, {"first_at": {"$gt": at}}]}),
+                  {"$set": {"first_at": at, "first_weight": weight}}),
+        UpdateOne(dict(key, **{"$or": [{"last_at": None}, {"last_at": {"$lte": at}}]}),
+                  {"$set": {"last_at": at, "last_weight": weight, "latest": latest}}),
+        # Open the week's bucket if it isn't there yet, then add to it
+        UpdateOne(dict(key, **{"weeks.week": {"$ne": week}}), {"$push": {"weeks": {
+            "$each": [{"week": week, "entries": 0, "weight_sum": 0.0, "bmi_sum": 0.0, "calories_sum": 0.0}],
+            "$sort": {"week": 1},
+            "$slice": -ROLLUP_WEEKS
+        }}}),
+        UpdateOne(dict(key, **{"weeks.week": week}), {"$inc": {
+            "weeks.$.entries": 1,
+            "weeks.$.weight_sum": weight,
+            "weeks.$.bmi_sum": bmi,
+            "weeks.$.calories_sum": calories
+        }}),
+    ]
+
+
+def _operations(documents):
+    operations = []
+    for document in documents:
+        operations.extend(rollup_operations(document))
+    return operations
+
+
+# ✅ Fold inserted user_data documents into their rollups (one round trip; failures only leave rollups stale)
+def update_rollups(rollups, documents):
+    operations = _operations(documents)
+    if rollups is None or not operations:
+        return
+    try:
+        with metrics.mongo('bulk_write', ROLLUPS_COLLECTION):
+            rollups.bulk_write(operations, ordered=True)
+    except Exception as e:
+        print(f"[WARNING] Could not update user rollups: {e}")
+
+
+# ✅ update_rollups for a motor collection (ASGI mode)
+async def update_rollups_async(rollups, documents):
+    operations = _operations(documents)
+    if rollups is None or not operations:
+        return
+    try:
+        with metrics.mongo('bulk_write', ROLLUPS_COLLECTION):
+            await rollups.bulk_write(operations, ordered=True)
+    except Exception as e:
+        print(f"[WARNING] Could not update user rollups: {e}")
+
+
+def dashboard_projection(fields):
+    """Rollup projection for the dashboard: the latest entry's ``fields``, weekly buckets, first weight."""
+    projection = {f"latest.{field}": 1 for field in fields}
+    projection.update({"weeks": 1, "first_weight": 1})
+    return projection
+
+
+def rollup_history(rollup):
+    """Weekly buckets in the shape returned by dashboard_aggregation (oldest first)."""
+    return [{
+        "week": bucket["week"],
+        "weight": bucket["weight_sum"] / bucket["entries"],
+        "bmi": bucket["bmi_sum"] / bucket["entries"],
+        "calories": bucket["calories_sum"] / bucket["entries"],
+        "entries": bucket["entries"]
+    } for bucket in rollup.get("weeks", []) if bucket["entries"]]
+
+
+def rebuild_rollup(collection, rollups, user_id, batch_size=500):
+    """Recompute one user's rollup from their user_data entries."""
+    rollups.delete_one({"_id": str(user_id)})
+    batch = []
+    for document in collection.find({"user_id": user_id}, sort=[("created_at", 1)]):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            rollups.bulk_write(_operations(batch), ordered=True)
+            batch = []
+    if batch:
+        rollups.bulk_write(_operations(batch), ordered=True)
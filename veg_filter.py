@@ -0,0 +1,39 @@
+# veg_filter.py
+"""Decide from a food's name whether it is non-vegetarian (the catalog has no diet column).
+
+Names are split into the same lowercase word tokens as the allergen index
+(scripts.preprocess_data.tokenize_food_name) and matched as whole tokens, so
+"graham crackers" or "gooseberries" don't count as ham or goose. Plural forms
+are listed explicitly rather than derived. A name with a token such as
+"meatless" or "vegetarian" is vegetarian whatever else it mentions
+("meatless chicken").
+"""
+import re
+
+_TOKEN_RE = re.compile(r"\w+")
+
+NONVEG_TOKENS = frozenset([
+    "chicken", "chickens", "mcchicken", "beef", "pork", "lamb", "mutton", "veal", "turkey", "turkeys",
+    "duck", "ducks", "goose", "geese", "bacon", "ham", "hams", "hamburger", "hamburgers",
+    "sausage", "sausages", "salami", "salamis", "pepperoni", "meat", "meats", "meatball", "meatballs",
+    "meatloaf", "keema", "steak", "steaks", "venison", "rabbit", "rabbits", "liver", "livers", "gelatin",
+    "fish", "fishes", "bluefish", "butterfish", "catfish", "crayfish", "cuttlefish", "dolphinfish",
+    "jellyfish", "milkfish", "monkfish", "rockfish", "sablefish", "sunfish", "swordfish", "tilefish",
+    "whitefish", "wolffish", "salmon", "tuna", "tunas", "cod", "lingcod", "trout", "seatrout",
+    "sardine", "sardines", "anchovy", "anchovies", "mackerel", "mackerels", "herring", "herrings",
+    "shrimp", "shrimps", "prawn", "prawns", "crab", "crabs", "lobster", "lobsters", "clam", "clams",
+    "oyster", "oysters", "mussel", "mussels", "scallop", "scallops", "squid", "squids",
+    "octopus", "octopuses",
+])
+
+# Tokens that make a name vegetarian even if it also has a non-veg token
+VEG_TOKENS = frozenset(["meatless", "vegetarian", "vegeterian", "vegan", "veggie"])
+
+
+def name_tokens(name):
+    return set(_TOKEN_RE.findall(str(name).lower()))
+
+
+def is_nonveg(name):
+    tokens = name_tokens(name)
+    return not tokens.isdisjoint(NONVEG_TOKENS) and tokens.isdisjoint(VEG_TOKENS)
@@ -0,0 +1,322 @@
+# write_behind.py
+"""Write-behind queue for recommendation documents.
+
+Requests put documents (with a client-generated ``_id``) on a bounded
+in-process queue and return immediately; a background thread batches them
+into ``insert_many`` calls. When MongoDB is unavailable, or the queue is
+full, documents are appended to a local JSONL journal which is replayed once
+the database is reachable again. An optional ``on_flush`` callback is told
+about every batch once it is in MongoDB (e.g. to invalidate response caches);
+documents a replay finds already inserted are left out, so the callback sees
+each document once.
+
+Several processes (gunicorn workers) can share one journal: appends and
+replays take an inter-process ``flock`` on ``<journal>.lock``. A replay first
+renames the journal aside under that lock and inserts from the renamed file,
+so documents appended meanwhile go to a fresh journal; whatever it could not
+insert is appended back. The number of pending documents is kept in
+``<journal>.count`` so stats() doesn't have to read the journal.
+"""
+import glob
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from bson import json_util
+
+try:
+    import fcntl
+except ImportError:  # Windows: no forked workers, the in-process lock is enough
+    fcntl = None
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _process_alive(pid):
+    if fcntl is None:
+        return pid == os.getpid()
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class WriteBehindQueue:
+    def __init__(self, get_collection, journal_path, maxsize=10000, batch_size=100,
+                 flush_interval=0.5, replay_interval=30.0, on_flush=None):
+        self._get_collection = get_collection
+        self._on_flush = on_flush
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.replay_interval = replay_interval
+
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._journal_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._last_replay = 0.0
+
+        self._lock_path = journal_path + '.lock'
+        self._count_path = journal_path + '.count'
+
+        self.flushed = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.flush_count = 0
+        self.flush_seconds_total = 0.0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+        # Count what is pending once (journal and unfinished replays); kept up to date from then on
+        with self._locked():
+            self._write_pending(sum(self._count_lines(path) for path in [self.journal_path] + self._replay_files()))
+
+    # The flusher thread is started lazily so it runs in each forked worker
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+
+    def put(self, document):
+        self.put_many([document])
+
+    def put_many(self, documents):
+        self.start()
+        overflow = []
+        for document in documents:
+            try:
+                self._queue.put_nowait(document)
+            except queue.Full:
+                overflow.append(document)
+        if overflow:
+            self._spill(overflow)
+
+    def flush(self):
+        """Synchronously write everything still queued (e.g. at shutdown)."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_maxsize': self._queue.maxsize,
+                'flushed': self.flushed,
+                'spilled': self.spilled,
+                'replayed': self.replayed,
+                'journal_pending': self._read_pending(),
+                'flush_count': self.flush_count,
+                'last_flush_ms': round(self.last_flush_seconds * 1000, 3),
+                'avg_flush_ms': round(self.flush_seconds_total / self.flush_count * 1000, 3) if self.flush_count else 0.0,
+                'max_flush_ms': round(self.max_flush_seconds * 1000, 3)
+            }
+
+    def _run(self):
+        while True:
+            try:
+                batch = self._next_batch()
+                if batch:
+                    self._flush(batch)
+                if time.monotonic() - self._last_replay >= self.replay_interval:
+                    self._last_replay = time.monotonic()
+                    self.replay()
+            except Exception as e:  # keep the flusher alive no matter what
+                print(f"[WARNING] Write-behind flusher error: {e}")
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _insert(collection, documents):
+        """Insert ``documents``; returns the ones that were not already in the collection."""
+        from pymongo.errors import BulkWriteError
+
+        try:
+            collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Replays after a partial success hit documents that already exist; those are fine
+            details = e.details or {}
+            errors = details.get('writeErrors', [])
+            if details.get('writeConcernErrors') or any(err.get('code') != DUPLICATE_KEY_ERROR for err in errors):
+                raise
+            existing = {err.get('index') for err in errors}
+            return [document for i, document in enumerate(documents) if i not in existing]
+        return documents
+
+    def _flush(self, batch):
+        collection = self._get_collection()
+        if collection is None:
+            self._spill(batch)
+            return
+
+        start = time.perf_counter()
+        try:
+            inserted = self._insert(collection, batch)
+        except Exception as e:
+            print(f"[WARNING] Error saving to MongoDB, journaling {len(batch)} documents: {e}")
+            self._spill(batch)
+            return
+        elapsed = time.perf_counter() - start
+
+        with self._stats_lock:
+            self.flushed += len(batch)
+            self.flush_count += 1
+            self.flush_seconds_total += elapsed
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        self._notify(inserted)
+
+    def _notify(self, documents):
+        if documents and self._on_flush is not None:
+            try:
+                self._on_flush(documents)
+            except Exception as e:
+                print(f"[WARNING] Write-behind flush callback error: {e}")
+
+    @contextmanager
+    def _locked(self):
+        """Journal lock, held across threads of this process and across processes sharing the journal."""
+        with self._journal_lock:
+            directory = os.path.dirname(self.journal_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self._lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_pending(self):
+        try:
+            with open(self._count_path, encoding='utf-8') as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return 0
+
+    def _write_pending(self, pending):
+        # Replaced atomically: stats() reads it without the lock
+        tmp_path = f"{self._count_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(max(0, pending)))
+        os.replace(tmp_path, self._count_path)
+
+    @staticmethod
+    def _count_lines(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return sum(1 for line in f if line.strip())
+        except OSError:
+            return 0
+
+    def _replay_files(self):
+        return glob.glob(glob.escape(self.journal_path) + '.replay-*')
+
+    def _append(self, path, lines):
+        with open(path, 'a+b') as f:
+            # Don't glue the first line onto a last line cut short by a crash
+            if f.tell() and (f.seek(-1, os.SEEK_END) or f.read(1) != b'\n'):
+                f.write(b'\n')
+            f.writelines(line.encode('utf-8') for line in lines)
+
+    def _spill(self, documents):
+        with self._locked():
+            self._append(self.journal_path, [json_util.dumps(document) + '\n' for document in documents])
+            self._write_pending(self._read_pending() + len(documents))
+        with self._stats_lock:
+            self.spilled += len(documents)
+
+    def _claim(self):
+        """Rename the journal (and replays left behind by dead processes) aside for this replay; needs the lock."""
+        claimed = []
+        for path in [self.journal_path] + self._replay_files():
+            if path != self.journal_path:
+                pid = int(path.rsplit('.replay-', 1)[1].split('-')[0])
+                if _process_alive(pid):
+                    continue  # still being replayed
+            elif not os.path.exists(path):
+                continue
+            claimed_path = f"{self.journal_path}.replay-{os.getpid()}-{time.time_ns()}"
+            os.rename(path, claimed_path)
+            claimed.append(claimed_path)
+        return claimed
+
+    def replay(self):
+        """Insert journaled documents once MongoDB is reachable; keeps whatever still fails."""
+        collection = self._get_collection()
+        if collection is None or (not os.path.exists(self.journal_path) and not self._replay_files()):
+            return
+
+        with self._locked():
+            claimed = self._claim()
+        if not claimed:
+            return
+
+        lines = []
+        for path in claimed:
+            with open(path, encoding='utf-8') as f:
+                lines.extend(line if line.endswith('\n') else line + '\n' for line in f if line.strip())
+
+        done = 0
+        rejected = []
+        try:
+            for i in range(0, len(lines), self.batch_size):
+                chunk = lines[i:i + self.batch_size]
+                documents = []
+                for line in chunk:
+                    try:
+                        documents.append(json_util.loads(line))
+                    except ValueError:
+                        # A line cut short by a crash; set aside instead of blocking the replay
+                        rejected.append(line)
+                if documents:
+                    self._notify(self._insert(collection, documents))
+                done += len(chunk)
+        except Exception as e:
+            print(f"[WARNING] Journal replay stopped, {len(lines) - done} documents pending: {e}")
+        finally:
+            with self._locked():
+                if done < len(lines):
+                    self._append(self.journal_path, lines[done:])
+                if rejected:
+                    self._append(self.journal_path + '.rejected', rejected)
+                    print(f"[WARNING] {len(rejected)} unreadable journal lines moved to {self.journal_path}.rejected")
+                for path in claimed:
+                    os.remove(path)
+                self._write_pending(self._read_pending() - done)
+
+        replayed = done - len(rejected)
+        if replayed:
+            print(f"[OK] Replayed {replayed} journaled documents into MongoDB")
+            with self._stats_lock:
+                self.replayed += replayed